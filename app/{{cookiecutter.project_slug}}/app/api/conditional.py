@@ -0,0 +1,47 @@
+import hashlib
+from datetime import UTC, datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def validators(request: Request, *version: Any, last_modified: datetime | None) -> dict[str, str]:
+    """
+    `ETag` and `Last-Modified` headers of a representation.
+    The ETag hashes `version`, e.g. `(max(updated_at), count)` for a list, with the path and
+    query string, since pages, sorts and fields of the same rows are different representations.
+    """
+    key = repr((request.url.path, request.url.query, version)).encode()
+    headers = {"ETag": f'W/"{hashlib.sha1(key, usedforsecurity=False).hexdigest()}"'}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(UTC), usegmt=True)
+    return headers
+
+
+def not_modified(request: Request, headers: dict[str, str]) -> Response | None:
+    """
+    304 response when the client copy is still valid, else None.
+    If-None-Match takes precedence over If-Modified-Since, see RFC 9110 13.2.2.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison, the W/ prefix is ignored
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        matches = "*" in tags or headers["ETag"].removeprefix("W/") in tags
+    elif (since := request.headers.get("if-modified-since")) and "Last-Modified" in headers:
+        try:
+            # HTTP dates have a one second resolution
+            matches = parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(
+                since
+            )
+        except (TypeError, ValueError):
+            matches = False
+    else:
+        matches = False
+    return Response(status_code=304, headers=headers) if matches else None
@@ -1,11 +1,29 @@
-from typing import NoReturn
+from typing import Any, NoReturn
 
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Request, status
 from fastapi.security import HTTPBearer
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from app.core.config import settings
+from app.core.request_context import current_route
+from app.models.base import Page, partial_model
 
 oauth2_scheme = HTTPBearer()
 
 
+async def bind_route(request: Request) -> None:
+    """Expose the route template to code without the request, e.g. pool instrumentation"""
+    route = request.scope.get("route")
+    current_route.set(getattr(route, "path", request.url.path))
+
+
+async def require_internal() -> None:
+    """Internal routes answer 404 unless EXPOSE_INTERNAL is set"""
+    if not settings.EXPOSE_INTERNAL:
+        raise_404()
+
+
 def raise_400(msg=None) -> NoReturn:
     raise HTTPException(
         status_code=status.HTTP_400_BAD_REQUEST,
@@ -39,3 +57,29 @@ def raise_500() -> NoReturn:
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         detail="Internal Server Error",
     )
+
+
+def sparse_response(
+    content: Page | Any,
+    schema: type[BaseModel],
+    fields: list[str],
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """
+    Serialize a page or an object with `schema` restricted to `fields`.
+    Returning a Response bypasses the full response_model of the endpoint.
+    """
+    try:
+        model = partial_model(schema, tuple(sorted(set(fields))))
+    except ValueError as e:
+        raise_400(msg=str(e))
+    if isinstance(content, Page):
+        content = Page[model](
+            items=[model.model_validate(item) for item in content.items],
+            total=content.total,
+            has_next=content.has_next,
+            next_cursor=content.next_cursor,
+        )
+    else:
+        content = model.model_validate(content)
+    return Response(content.model_dump_json(), media_type="application/json", headers=headers)
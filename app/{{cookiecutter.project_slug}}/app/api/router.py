@@ -1,16 +1,30 @@
 import os
 from typing import Any
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Request
+from starlette.responses import JSONResponse, Response
 
-api_router = APIRouter()
+from app.api.deps import bind_route
+from app.core.metrics import render_metrics
+
+api_router = APIRouter(dependencies=[Depends(bind_route)])
 
 
 @api_router.get("/health", tags=["Health"])
-def get_health() -> Any:
+def get_health(request: Request) -> Any:
+    # Not ready while the lifespan warms up or shuts down, ready when it does not run
+    if not getattr(request.app.state, "ready", True):
+        return JSONResponse({"status": "NOT_READY"}, status_code=503)
     return {"status": "OK"}
 
 
+@api_router.get("/metrics", include_in_schema=False)
+def get_metrics() -> Response:
+    """Prometheus exposition of the request metrics recorded by ObservabilityMiddleware"""
+    content, media_type = render_metrics()
+    return Response(content, media_type=media_type)
+
+
 # Define the directory where your router modules are located
 routers_directory = ["app/firestore/endpoints", "app/sqlmodel/api/endpoints"]
 
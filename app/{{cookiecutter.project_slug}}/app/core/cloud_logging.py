@@ -7,11 +7,16 @@ from asgi_correlation_id import CorrelationIdFilter
 from fastapi.logger import logger as fastapi_logger
 from google.cloud.logging_v2.client import Client as google_cloud_logging_v2_client
 from google.cloud.logging_v2.handlers import CloudLoggingFilter, CloudLoggingHandler
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
 
 from app.core.config import settings
+from app.core.log_shipping import (
+    FileSink,
+    LoggerStructSink,
+    StreamSink,
+    StructLogQueue,
+    StructLogSink,
+)
 
 cloud_trace_context: contextvars.ContextVar = contextvars.ContextVar(
     "cloud_trace_context", default=""
@@ -21,36 +26,29 @@ http_request_context: contextvars.ContextVar = contextvars.ContextVar(
 )
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
+def bind_request_context(request: Request) -> None:
     """
-    Middleware to grab the trace context from the incoming request and store it in the contextvars.
+    Store the trace context and the HTTP request of the incoming request in the contextvars,
+    GoogleCloudLogFilter attaches them to every record logged while handling it.
     """
+    if "x-cloud-trace-context" in request.headers:
+        cloud_trace_context.set(request.headers.get("x-cloud-trace-context"))
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        if "x-cloud-trace-context" in request.headers:
-            cloud_trace_context.set(request.headers.get("x-cloud-trace-context"))
-
-        http_request = {
-            "requestMethod": request.method,
-            "requestUrl": request.url.path,
-            "requestSize": sys.getsizeof(request),
-            "remoteIp": request.client.host if request.client else None,
-            "protocol": request.url.scheme,
-        }
+    http_request = {
+        "requestMethod": request.method,
+        "requestUrl": request.url.path,
+        "requestSize": sys.getsizeof(request),
+        "remoteIp": request.client.host if request.client else None,
+        "protocol": request.url.scheme,
+    }
 
-        if "referrer" in request.headers:
-            http_request["referrer"] = request.headers.get("referrer")
+    if "referrer" in request.headers:
+        http_request["referrer"] = request.headers.get("referrer")
 
-        if "user-agent" in request.headers:
-            http_request["userAgent"] = request.headers.get("user-agent")
+    if "user-agent" in request.headers:
+        http_request["userAgent"] = request.headers.get("user-agent")
 
-        http_request_context.set(http_request)
-
-        try:
-            return await call_next(request)
-        except Exception as ex:
-            logging.exception(f"Request failed: {ex}")
-            return JSONResponse(status_code=500, content={"success": False, "message": str(ex)})
+    http_request_context.set(http_request)
 
 
 class GoogleCloudLogFilter(CloudLoggingFilter):
@@ -146,5 +144,22 @@ class LoggerStruct(metaclass=Singleton):
 
 # Update the "fastapi" logger to have a _global_ level of `settings.LOG_LEVEL`
 logging.getLogger("fastapi").setLevel(settings.LOG_LEVEL)
+
+
+def get_struct_log_sink() -> StructLogSink:
+    if settings.LOG_SINK == "stdout":
+        return StreamSink()
+    if settings.LOG_SINK == "file":
+        return FileSink(settings.LOG_SINK_FILE)
+    return LoggerStructSink(LoggerStruct().logger_struct)
+
+
 log: logging.Logger = Logging().get_logger()
-logger_struct = LoggerStruct().logger_struct
+# `log_struct` only enqueues, the worker is started and stopped by the lifespan of the app
+logger_struct = StructLogQueue(
+    get_struct_log_sink(),
+    maxsize=settings.LOG_QUEUE_SIZE,
+    batch_size=settings.LOG_BATCH_SIZE,
+    flush_interval=settings.LOG_FLUSH_SECONDS,
+    drop=settings.LOG_QUEUE_DROP,
+)
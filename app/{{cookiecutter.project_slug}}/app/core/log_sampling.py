@@ -0,0 +1,44 @@
+import random
+import zlib
+from typing import Literal
+
+from app.core.config import settings
+
+# Why a request is logged: picked by its sample rate, or kept afterwards by its outcome
+SampleReason = Literal["rate", "status", "slow"]
+
+
+def sample_rate(route: str) -> float:
+    """Share of the requests of a route template which are logged"""
+    return settings.LOG_SAMPLE_RATES.get(route, settings.LOG_SAMPLE_RATE)
+
+
+def head_sampled(route: str, correlation_id: str | None) -> bool:
+    """
+    Decision taken when the request starts, before any body is captured.
+    It hashes the correlation id, so every service seeing the same id takes the same decision.
+    """
+    rate = sample_rate(route)
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    if correlation_id is None:
+        return random.random() < rate
+    return zlib.crc32(correlation_id.encode()) / 2**32 < rate
+
+
+def tail_sampled(status_code: int, seconds: float) -> SampleReason | None:
+    """Errors and slow requests are logged whatever their sample rate"""
+    if status_code >= settings.LOG_ALWAYS_STATUS:
+        return "status"
+    if seconds >= settings.LOG_SLOW_REQUEST_SECONDS:
+        return "slow"
+    return None
+
+
+def captures_body(route: str) -> bool:
+    """Bodies are captured for the routes opted in, or for all of them when none are"""
+    if settings.LOG_BODY_ROUTES is None:
+        return True
+    return route in settings.LOG_BODY_ROUTES
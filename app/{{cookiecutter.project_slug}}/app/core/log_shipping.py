@@ -0,0 +1,139 @@
+import asyncio
+import contextlib
+import json
+import logging
+import sys
+from collections import deque
+from typing import Any, Literal, Protocol, TextIO
+
+# The "fastapi" logger of cloud_logging, which imports this module
+log = logging.getLogger("fastapi")
+
+
+class StructLogSink(Protocol):
+    def write(self, entries: list[dict[str, Any]]) -> None:
+        """Ship a batch of entries, called in a worker thread"""
+
+
+class LoggerStructSink:
+    def __init__(self, logger: Any):
+        """Cloud Logging logger of LoggerStruct, a batch is sent in a single API call"""
+        self.logger = logger
+
+    def write(self, entries: list[dict[str, Any]]) -> None:
+        # The local mock of LoggerStruct has no batch
+        if not hasattr(self.logger, "batch"):
+            for entry in entries:
+                self.logger.log_struct(entry)
+            return
+        batch = self.logger.batch()
+        for entry in entries:
+            batch.log_struct(entry)
+        batch.commit()
+
+
+class StreamSink:
+    def __init__(self, stream: TextIO = sys.stdout):
+        """Entries written as JSON lines, to stdout by default"""
+        self.stream = stream
+
+    def write(self, entries: list[dict[str, Any]]) -> None:
+        self.stream.writelines(json.dumps(entry, default=str) + "\n" for entry in entries)
+        self.stream.flush()
+
+
+class FileSink(StreamSink):
+    def __init__(self, path: str):
+        """Entries appended as JSON lines to the file at `path`"""
+        super().__init__(open(path, "a", encoding="utf-8"))
+
+
+class StructLogQueue:
+    def __init__(
+        self,
+        sink: StructLogSink,
+        maxsize: int,
+        batch_size: int,
+        flush_interval: float,
+        drop: Literal["newest", "oldest"] = "newest",
+    ):
+        """
+        Bounded in-memory queue of structured log entries, shipped to `sink` in batches by a
+        background worker, so that logging never waits for the backend on the event loop.
+        **Parameters**
+        * `sink`: Where the batches are written, in a worker thread
+        * `maxsize`: Number of entries queued, more are dropped and counted
+        * `batch_size`: Entries per batch, a full batch is shipped without waiting
+        * `flush_interval`: Seconds after which a partial batch is shipped
+        * `drop`: When the queue is full, drop the incoming entry or the oldest queued one
+        """
+        self.sink = sink
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop = drop
+        self.entries: deque[dict[str, Any]] = deque()
+        self.dropped = 0
+        self.shipped = 0
+        self.failed = 0
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+
+    def log_struct(self, info: dict[str, Any]) -> None:
+        """Enqueue an entry, never blocks"""
+        if len(self.entries) >= self.maxsize:
+            self.dropped += 1
+            if self.drop == "newest":
+                return
+            self.entries.popleft()
+        self.entries.append(info)
+        if self._wakeup is not None and len(self.entries) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        """Start the worker on the running event loop"""
+        if self._task is None:
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the worker and ship what is still queued"""
+        if self._task is not None and self._wakeup is not None:
+            # Not cancelled, a batch being shipped would be lost
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._wakeup = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        while self.entries:
+            batch = [
+                self.entries.popleft() for _ in range(min(self.batch_size, len(self.entries)))
+            ]
+            try:
+                await asyncio.to_thread(self.sink.write, batch)
+                self.shipped += len(batch)
+            except Exception as e:
+                # Not retried, a failing backend must not grow the memory
+                self.failed += len(batch)
+                log.error(f"Failed to ship {len(batch)} structured log entries: {e}")
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while not self._closing:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            self._wakeup.clear()
+            await self.flush()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": len(self.entries),
+            "shipped": self.shipped,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
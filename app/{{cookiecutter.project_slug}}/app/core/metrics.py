@@ -0,0 +1,68 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    Summary,
+    generate_latest,
+    multiprocess,
+)
+from starlette.routing import Match
+from starlette.types import Scope
+
+# With PROMETHEUS_MULTIPROC_DIR set, every worker writes its values to files in that directory,
+# which must exist and be emptied before the workers start, and /metrics sums them
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# Label of requests which match no route, raw paths would be unbounded
+UNMATCHED_ROUTE = "unmatched"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time to handle a request, until the response is sent",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests being handled",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+)
+RESPONSE_SIZE = Summary(
+    "http_response_size_bytes",
+    "Size of the response bodies",
+    ["method", "route", "status"],
+)
+
+
+def route_template(app, scope: Scope) -> str:
+    """Path template of the route matching `scope`, e.g. "/api/todo/{_id}" """
+    if route := scope.get("route"):
+        return route.path
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Exposition of the metrics of this process, or of all the workers in multiprocess mode"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop the live gauges of this worker when it stops"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,35 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+# Route template of the current request, e.g. "/api/todo/{_id}", set by a router dependency
+current_route: ContextVar[str | None] = ContextVar("current_route", default=None)
+
+
+@dataclass
+class QueryStats:
+    """Statements executed while handling a request"""
+
+    count: int = 0
+    total: float = 0.0
+    slowest: float = 0.0
+    slowest_statement: str | None = None
+
+    def add(self, seconds: float, statement: str) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.slowest:
+            self.slowest = seconds
+            self.slowest_statement = statement[:200]
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        return (
+            f'db;dur={self.total * 1000:.1f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest * 1000:.1f}"
+        )
+
+
+# Set by ObservabilityMiddleware for the duration of a request
+current_query_stats: ContextVar[QueryStats | None] = ContextVar(
+    "current_query_stats", default=None
+)
@@ -7,10 +7,12 @@ from starlette.middleware.cors import CORSMiddleware
 from starlette_context.middleware import RawContextMiddleware
 
 from app.api.router import api_router
-from app.core.cloud_logging import LoggingMiddleware
+from app.core.cloud_logging import logger_struct
 from app.core.config import settings
-from app.middleware import ExceptionMiddleware, LoggingMiddlewareReq, MetricMiddleware
+from app.core.metrics import mark_process_dead
+from app.middleware import ObservabilityMiddleware
 from app.sqlmodel.db import session_manager
+from app.warmup import warm_up
 
 
 @asynccontextmanager
@@ -19,10 +21,20 @@ async def lifespan(app: FastAPI):
     Function that handles startup and shutdown events.
     To understand more, read https://fastapi.tiangolo.com/advanced/events/
     """
+    logger_struct.start()
+    # The health endpoint reports the instance as not ready until warm-up is done
+    app.state.ready = False
+    if settings.WARMUP_ENABLED:
+        await warm_up(app)
+    app.state.ready = True
     yield
+    app.state.ready = False
+    mark_process_dead()
+    # Close the DB connections of session_manager
     if session_manager._engine is not None:
-        # Close the DB connection
         await session_manager.close()
+    # Ship the structured entries still queued
+    await logger_struct.stop()
 
 
 app = FastAPI(
@@ -30,6 +42,7 @@ app = FastAPI(
     openapi_url=f"{settings.API_PREFIX}/openapi.json",
     docs_url=f"{settings.API_PREFIX}/docs",
     redoc_url=f"{settings.API_PREFIX}/redoc",
+    lifespan=lifespan,
 )
 
 
@@ -43,10 +56,7 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
-app.add_middleware(LoggingMiddleware)
-app.add_middleware(ExceptionMiddleware)
-app.add_middleware(LoggingMiddlewareReq)
-app.add_middleware(MetricMiddleware)
+app.add_middleware(ObservabilityMiddleware)
 app.add_middleware(RawContextMiddleware)
 app.add_middleware(CorrelationIdMiddleware)
 app.include_router(api_router, prefix=settings.API_PREFIX)
@@ -1,106 +1,189 @@
-import inspect
 import json
+import logging
 import time
-from collections.abc import AsyncIterator
-from typing import Any
+from dataclasses import asdict
 
-from fastapi import FastAPI
-from pydantic import ValidationError
-from starlette import status
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from asgi_correlation_id import correlation_id
+from starlette.datastructures import MutableHeaders
 from starlette.requests import Request
-from starlette.responses import JSONResponse, Response, StreamingResponse
-from starlette.types import Message
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from starlette_context import context
 
-from app.core.cloud_logging import log, logger_struct
+from app.core.cloud_logging import bind_request_context, log, logger_struct
 from app.core.config import settings
+from app.core.log_sampling import (
+    SampleReason,
+    captures_body,
+    head_sampled,
+    sample_rate,
+    tail_sampled,
+)
+from app.core.metrics import (
+    IN_FLIGHT,
+    REQUEST_LATENCY,
+    RESPONSE_SIZE,
+    route_template,
+    status_class,
+)
+from app.core.request_context import QueryStats, current_query_stats
 
 
-class ExceptionMiddleware(BaseHTTPMiddleware):
-    async def dispatch(
-        self, request: Request, call_next: RequestResponseEndpoint
-    ) -> StreamingResponse:
-        try:
-            if inspect.iscoroutinefunction(call_next):
-                response = await call_next(request)
-            else:
-                response = call_next(request)  # type: ignore
-        except ValidationError as e:
-            log.warning(e)
-            response = JSONResponse(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"detail": e.errors()}
-            )
-        except ValueError as e:
-            log.warning(e)
-            response = JSONResponse(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                content={
-                    "detail": [{"msg": str(e), "loc": request.url.path, "type": "Value error"}]
-                },
-            )
-        except Exception as e:
-            log.warning(e)
-            status_ = getattr(e, "status_code", status.HTTP_500_INTERNAL_SERVER_ERROR)
-            response = JSONResponse(
-                status_code=status_,
-                content={"detail": [{"msg": str(e), "loc": request.url.path, "type": "Unknown"}]},
-            )
-        return response  # type: ignore
+class BodyCapture:
+    def __init__(self, limit: int):
+        """
+        First `limit` bytes of a body sent in chunks, and its full size.
+        Chunks are only sliced, never concatenated, so a large body is not copied.
+        """
+        self.limit = limit
+        self.chunks: list[bytes] = []
+        self.kept = 0
+        self.size = 0
+
+    def add(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.kept < self.limit and chunk:
+            chunk = chunk[: self.limit - self.kept]
+            self.chunks.append(chunk)
+            self.kept += len(chunk)
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > self.kept
+
+    def text(self) -> str:
+        # The cut may split a multi-byte character
+        return b"".join(self.chunks).decode("utf-8", errors="replace")
+
 
+def is_captured(route: str, content_type: str | None) -> bool:
+    """Whether a body of this route and content type is kept for the logs"""
+    if route in settings.LOG_NO_CAPTURE_ROUTES or not captures_body(route):
+        return False
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return media_type not in settings.LOG_NO_CAPTURE_CONTENT_TYPES
 
-class LoggingMiddlewareReq(BaseHTTPMiddleware):
+
+class ObservabilityMiddleware:
     """
-    Get the body request and the body response, and all the information about the request
-    It will log all the information about the request and the response
+    Pure ASGI middleware logging, timing and measuring every HTTP request.
+    It wraps `receive` and `send` instead of the request and response objects, so unlike
+    BaseHTTPMiddleware it adds no task nor stream per request:
+    * the trace context and the HTTP request are bound for the Cloud Logging records
+    * requests are logged as sampled by app/core/log_sampling.py, the decision is taken
+      before any body work, errors and slow requests are always logged
+    * request and response chunks are forwarded untouched, the first
+      `LOG_BODY_MAX_BYTES` of each body are kept for the logs of sampled requests,
+      unless they are not captured
+    * `X-Request-Time` and `Server-Timing` headers are added to the response
+    * the Prometheus latency, in-flight and response size metrics are recorded
+    * an unhandled exception is logged and answered with a 500 JSON response
     """
 
-    def __init__(self, app: FastAPI):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-    async def set_body(self, request: Request, body: bytes) -> None:
-        """Issue with starlette : https://github.com/encode/starlette/issues/847
-        Need to override the receive method to get the body of the request, otherwise it will hang
-        """
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request = Request(scope)
+        bind_request_context(request)
+        route = route_template(request.app, scope)
+        sampled = head_sampled(route, correlation_id.get())
+
+        request_capture = (
+            BodyCapture(settings.LOG_BODY_MAX_BYTES)
+            if sampled and is_captured(route, request.headers.get("content-type"))
+            else None
+        )
+
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if message["type"] == "http.request" and request_capture is not None:
+                request_capture.add(message.get("body", b""))
+            return message
+
+        # Filled by the SQLAlchemy cursor listeners while the endpoint runs
+        query_stats = QueryStats()
+        token = current_query_stats.set(query_stats)
+        in_flight = IN_FLIGHT.labels(request.method, route)
+        in_flight.inc()
+
+        status_code = 500
+        response_started = False
+        response_size = 0
+        response_capture: BodyCapture | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_started, response_size, response_capture
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                request_time = time.perf_counter() - start
+                log.info(f"Request time {request_time:.3f} seconds")
+                headers = MutableHeaders(scope=message)
+                headers["X-Request-Time"] = f"{request_time:.3f}"
+                server_timing = query_stats.server_timing()
+                headers["Server-Timing"] = f"{server_timing}, total;dur={request_time * 1000:.1f}"
+                if sampled and is_captured(route, headers.get("content-type")):
+                    response_capture = BodyCapture(settings.LOG_BODY_MAX_BYTES)
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                response_size += len(chunk)
+                if response_capture is not None:
+                    response_capture.add(chunk)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        except Exception as ex:
+            logging.exception(f"Request failed: {ex}")
+            if response_started:
+                raise
+            response = JSONResponse(
+                status_code=500, content={"success": False, "message": str(ex)}
+            )
+            await response(scope, receive_wrapper, send_wrapper)
+        finally:
+            current_query_stats.reset(token)
+            in_flight.dec()
+            seconds = time.perf_counter() - start
+            labels = (request.method, route, status_class(status_code))
+            REQUEST_LATENCY.labels(*labels).observe(seconds)
+            RESPONSE_SIZE.labels(*labels).observe(response_size)
 
-        async def receive() -> Message:
-            return {"type": "http.request", "body": body}
-
-        request._receive = receive
-
-    async def get_body(self, request: Request) -> bytes:
-        """Workaround for hang issue"""
-        body = await request.body()
-        await self.set_body(request, body)
-        return body
-
-    async def read_bytes(self, generator: AsyncIterator[bytes]) -> bytes:
-        body = b""
-        async for data in generator:
-            body += data
-        return body
-
-    async def resolve_response(self, streaming_response: Any) -> Response:
-        """Resolve the response from the streaming response"""
-        content = await self.read_bytes(streaming_response.body_iterator)
-        status_code = streaming_response.status_code
-        headers = dict(streaming_response.headers) if streaming_response.headers else None
-        media_type = "application/json"
-        background = streaming_response.background
-        return Response(content, status_code, headers, media_type, background)
-
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Any:
+        # Requests not sampled when they started are logged without their bodies
+        reason = "rate" if sampled else tail_sampled(status_code, seconds)
+        if reason is not None:
+            self._log(
+                request, route, reason, request_capture, status_code, response_capture, query_stats
+            )
+
+    def _log(
+        self,
+        request: Request,
+        route: str,
+        reason: SampleReason,
+        request_capture: BodyCapture | None,
+        status_code: int,
+        response_capture: BodyCapture | None,
+        query_stats: QueryStats,
+    ) -> None:
         try:
             request_body = None
-            try:
-                request_body = json.loads(await request.body())
-            except Exception:
-                pass
-            response = await call_next(request)
-            response_body = await self.resolve_response(response)
+            if request_capture is not None and request_capture.kept:
+                request_body = request_capture.text()
+                if not request_capture.truncated:
+                    try:
+                        request_body = json.loads(request_body)
+                    except ValueError:
+                        pass
             if settings.ENV in ["local", "test"]:
                 self._log_request(request, request_body, context)
-                self._log_response(request, response_body)
+                self._log_response(request, status_code, response_capture)
             logger_struct.log_struct(
                 {
                     "user": context.get("USER_ID"),
@@ -109,15 +192,24 @@ class LoggingMiddlewareReq(BaseHTTPMiddleware):
                     "path_params": request.path_params,
                     "query": request.query_params._dict,
                     "body": request_body if request_body else {},
-                    "status_code": response_body.status_code,
-                    "content": response_body.body.decode("utf-8"),
+                    "body_bytes": request_capture.size if request_capture else None,
+                    "body_truncated": bool(request_capture and request_capture.truncated),
+                    "status_code": status_code,
+                    "content": (
+                        response_capture.text()
+                        if response_capture and response_capture.kept
+                        else None
+                    ),
+                    "content_bytes": response_capture.size if response_capture else None,
+                    "content_truncated": bool(response_capture and response_capture.truncated),
+                    "db": asdict(query_stats),
+                    "sample_rate": sample_rate(route),
+                    "sampled_by": reason,
                 }
             )
         except Exception as e:
             log.error("Error in logging middleware")
             log.error(e)
-        finally:
-            return response_body if response_body else response
 
     def _log_request(self, request, request_body, context):
         log_lines = [f"===== REQUEST ({request.method} {request.url.path}) ====="]
@@ -131,29 +223,39 @@ class LoggingMiddlewareReq(BaseHTTPMiddleware):
             ("Body:", request_body),
         ]:
             log_lines.append(f"    {param_type}")
-            if params:
+            if isinstance(params, dict) and params:
                 log_lines.extend(f"        {key}: {value}" for key, value in params.items())
+            elif params:
+                # Truncated or non JSON body
+                log_lines.append(f"        {params}")
             else:
                 log_lines.append("        Empty")
 
         print("\n".join(log_lines))
 
-    def _log_response(self, request, response_body):
+    def _log_response(self, request, status_code, response_capture):
         header = f"\n===== RESPONSE ({request.method} {request.url.path}) =====\n"
 
-        if response_body:
-            content = json.loads(response_body.body.decode("utf-8"))
-            status_code = f"    Status code:\n        {response_body.status_code}"
-            content_length = f"\n    Content-Length:\n        {len(str(content))}"
-            content_summary = (
-                f"        {content['total']} items"
-                if content and "total" in content
-                else (
-                    f"        {len(content)} items"
-                    if isinstance(content, list)
-                    else f"        {content}"
+        if response_capture and response_capture.kept:
+            status_code = f"    Status code:\n        {status_code}"
+            content_length = f"\n    Content-Length:\n        {response_capture.size}"
+            try:
+                if response_capture.truncated:
+                    raise ValueError("Truncated body")
+                content = json.loads(response_capture.text())
+                content_summary = (
+                    f"        {content['total']} items"
+                    if isinstance(content, dict) and "total" in content
+                    else (
+                        f"        {len(content)} items"
+                        if isinstance(content, list)
+                        else f"        {content}"
+                    )
                 )
-            )
+            except ValueError:
+                content_summary = f"        {response_capture.text()}"
+                if response_capture.truncated:
+                    content_summary += f" ... ({response_capture.size} bytes)"
         else:
             status_code = "    Status code: (Unknown)"
             content_length = "\n    Content-Length: (Unknown)"
@@ -168,18 +270,3 @@ class LoggingMiddlewareReq(BaseHTTPMiddleware):
         )
 
         print(log_message)
-
-
-class MetricMiddleware(BaseHTTPMiddleware):
-    async def dispatch(
-        self, request: Request, call_next: RequestResponseEndpoint
-    ) -> StreamingResponse:
-        start = time.perf_counter()
-        if inspect.iscoroutinefunction(call_next):
-            response = await call_next(request)
-        else:
-            response = call_next(request)  # type: ignore
-        end_time = time.perf_counter() - start
-        log.info(f"Request time {end_time:.3f} seconds")
-        response.headers["X-Request-Time"] = f"{end_time:.3f}"
-        return response  # type: ignore
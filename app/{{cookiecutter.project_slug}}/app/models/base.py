@@ -1,6 +1,7 @@
-from typing import Generic, TypeVar
+from functools import lru_cache
+from typing import Any, Generic, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, PrivateAttr, create_model
 
 T = TypeVar("T")
 
@@ -21,8 +22,47 @@ class DateTimeModelMixin(BaseModel, Generic[T]):
 
 class Page(BaseModel, Generic[T]):
     items: list[T]
-    total: int
+    total: int | None
+    has_next: bool = False
+    next_cursor: str | None = None
+    # Version of the listed set, when the page query computed it, not serialized
+    _version: tuple[Any, ...] | None = PrivateAttr(default=None)
+
+    @property
+    def version(self) -> tuple[Any, ...] | None:
+        return self._version
+
+    class ConfigDict:
+        alias_generator = to_camel
+        populate_by_name = True
+
+
+class BulkError(BaseModel):
+    index: int
+    id: int | None = None
+    msg: str
+
+
+class BulkResult(BaseModel, Generic[T]):
+    items: list[T]
+    errors: list[BulkError] = []
 
     class ConfigDict:
         alias_generator = to_camel
         populate_by_name = True
+
+
+@lru_cache(maxsize=256)
+def partial_model(model: type[BaseModel], fields: tuple[str, ...]) -> type[BaseModel]:
+    """Copy of `model` restricted to `fields`, to serialize sparse fieldsets"""
+    if unknown := set(fields) - set(model.model_fields):
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return create_model(
+        f"{model.__name__}Partial",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (field.annotation, field)
+            for name, field in model.model_fields.items()
+            if name in fields
+        },
+    )
@@ -1,25 +1,59 @@
 import json
+from collections.abc import Callable
+from contextlib import AbstractAsyncContextManager
+from functools import lru_cache
 from typing import Annotated
 
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import raise_400
-from app.sqlmodel.db import get_db_session
-from app.sqlmodel.models.base import QueryFilter
+from app.core.config import settings
+from app.sqlmodel.db import (
+    get_db_read_session,
+    get_db_read_session_factory,
+    get_db_session,
+    get_db_session_factory,
+)
+from app.sqlmodel.models.base import QueryFilter, to_snake
 
 session_dep = Annotated[AsyncSession, Depends(get_db_session)]
+session_factory_dep = Annotated[
+    Callable[[], AbstractAsyncContextManager[AsyncSession]], Depends(get_db_session_factory)
+]
+# Replica sessions of read only endpoints, see get_db_read_session
+read_session_dep = Annotated[AsyncSession, Depends(get_db_read_session)]
+read_session_factory_dep = Annotated[
+    Callable[[], AbstractAsyncContextManager[AsyncSession]], Depends(get_db_read_session_factory)
+]
 
 
 def parse_query_filter_params(filters: str | None = None) -> list[QueryFilter]:
     if not filters:
         return []
 
+    return list(parse_raw_query_filters(filters))
+
+
+@lru_cache(maxsize=settings.QUERY_FILTER_CACHE_SIZE)
+def parse_raw_query_filters(filters: str) -> tuple[QueryFilter, ...]:
+    """
+    Validated filters of a raw `filters` query parameter.
+    Clients polling with the same filters skip JSON decoding and validation.
+    The returned filters are shared between requests and must not be mutated.
+    """
     query_filters = json.loads(filters)
 
     if isinstance(query_filters, list):
-        return [QueryFilter(**filter_) for filter_ in query_filters]
+        return tuple(QueryFilter(**filter_) for filter_ in query_filters)
     elif isinstance(query_filters, dict):
-        return [QueryFilter(**query_filters)]
+        return (QueryFilter(**query_filters),)
     else:
         raise_400(msg="Invalid query filters")
+
+
+def parse_fields_param(fields: str | None = None) -> list[str] | None:
+    """Comma separated list of the fields to return, all of them when empty"""
+    if not fields:
+        return None
+    return [to_snake(field.strip()) for field in fields.split(",") if field.strip()] or None
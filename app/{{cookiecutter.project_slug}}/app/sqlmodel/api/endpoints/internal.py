@@ -0,0 +1,29 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app.api.deps import require_internal
+from app.core.cloud_logging import logger_struct
+from app.sqlmodel.db import session_manager
+
+router = APIRouter(dependencies=[Depends(require_internal)])
+
+
+@router.get("/pool", include_in_schema=False)
+async def read_pool_stats() -> Any:
+    """
+    Pool gauges, checkout wait and connection hold time per route of every engine,
+    and the sessions currently open. Also sent to the structured logger.
+    """
+    stats = {
+        "pools": [pool_stats.snapshot() for pool_stats in session_manager.pool_stats],
+        "sessions": session_manager.session_stats.snapshot(),
+    }
+    logger_struct.log_struct({"event": "pool_stats", **stats})
+    return stats
+
+
+@router.get("/logs", include_in_schema=False)
+async def read_log_queue_stats() -> Any:
+    """Structured log entries queued, shipped, dropped because the queue was full, and failed"""
+    return logger_struct.stats()
@@ -1,20 +1,34 @@
 from typing import Any
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.orm import selectinload
+from starlette.responses import Response, StreamingResponse
 
-from app.api.deps import raise_400, raise_404, raise_500
+from app.api.conditional import is_conditional, not_modified, validators
+from app.api.deps import raise_400, raise_404, raise_500, sparse_response
 from app.core.cloud_logging import log
-from app.models.base import Page
-from app.sqlmodel.api.deps import parse_query_filter_params, session_dep
+from app.core.config import settings
+from app.models.base import BulkResult, Page
+from app.sqlmodel.api.deps import (
+    parse_fields_param,
+    parse_query_filter_params,
+    read_session_dep,
+    read_session_factory_dep,
+    session_dep,
+)
+from app.sqlmodel.crud.base import CountMode
 from app.sqlmodel.crud.todo import todos as crud_todo
 from app.sqlmodel.models.base import QueryFilter
 from app.sqlmodel.models.todo import (
     Todo,
     TodoCreate,
+    TodoPatch,
     TodoRead,
     TodoReadUsers,
     TodoUpdate,
+    TodoUpdateMany,
 )
+from app.utils.export import ExportFormat, export_response
 
 router = APIRouter()
 
@@ -25,18 +39,32 @@ router = APIRouter()
 )
 async def read_todos(
     *,
-    db: session_dep,
+    db: read_session_dep,
+    request: Request,
+    response: Response,
     page: int | None = 1,
     per_page: int | None = 20,
     sort: str | None = None,
     filters: list[QueryFilter] = Depends(parse_query_filter_params),
     is_desc: bool = False,
     use_or: bool = False,
+    cursor: str | None = None,
+    count: CountMode = "exact",
+    fields: list[str] | None = Depends(parse_fields_param),
 ) -> Page[Todo]:
     """
     Retrieve crud_todo.
     """
     try:
+        # Lists only have an ETag, a DELETE leaves max(updated_at) and so Last-Modified as is.
+        # The version is only queried to answer If-None-Match, else it is sent when the
+        # page query computed it, see CRUDBase.order_and_paginate_results
+        headers: dict[str, str] = {}
+        if "if-none-match" in request.headers:
+            version = await crud_todo.get_multi_version(db, filters=filters, use_or=use_or)
+            headers = validators(request, *version, last_modified=None)
+            if unchanged := not_modified(request, headers):
+                return unchanged
         todos = await crud_todo.get_multi(
             db,
             page=page,
@@ -45,8 +73,12 @@ async def read_todos(
             is_desc=is_desc,
             filters=filters,
             use_or=use_or,
+            cursor=cursor,
+            count=count,
+            fields=fields,
         )
-        return todos
+        if not headers and todos.version is not None:
+            headers = validators(request, *todos.version, last_modified=None)
     except (AttributeError, KeyError, ValueError) as e:
         log.exception(e)
         raise_400()
@@ -54,6 +86,11 @@ async def read_todos(
         log.exception(e)
         raise_500()
 
+    response.headers.update(headers)
+    if fields:
+        return sparse_response(todos, TodoRead, fields, headers)
+    return todos
+
 
 @router.get(
     "/withusers",
@@ -61,7 +98,7 @@ async def read_todos(
 )
 async def read_todos_users(
     *,
-    db: session_dep,
+    db: read_session_dep,
     page: int | None = 1,
     per_page: int | None = 20,
     sort: str | None = None,
@@ -81,6 +118,7 @@ async def read_todos_users(
             is_desc=is_desc,
             filters=filters,
             use_or=use_or,
+            options=[selectinload(Todo.users)],
         )
         return todos.items
     except Exception as e:
@@ -88,6 +126,37 @@ async def read_todos_users(
         raise_500()
 
 
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+)
+async def export_todos(
+    *,
+    session_factory: read_session_factory_dep,
+    format: ExportFormat = "ndjson",
+    sort: str | None = None,
+    filters: list[QueryFilter] = Depends(parse_query_filter_params),
+    is_desc: bool = False,
+    use_or: bool = False,
+) -> StreamingResponse:
+    """
+    Export all the todos matching the filters, streamed as NDJSON or CSV.
+    """
+    try:
+        statement = crud_todo.select_filtered(filters, use_or)
+    except (AttributeError, KeyError, ValueError) as e:
+        log.exception(e)
+        raise_400()
+
+    async def chunks():
+        # The response is streamed after the endpoint returned, it needs its own session
+        async with session_factory() as db:
+            async for chunk in crud_todo.stream(db, statement, sort=sort, is_desc=is_desc):
+                yield chunk
+
+    return export_response(chunks(), TodoRead, format, "todos")
+
+
 @router.post(
     "",
     response_model=TodoRead,
@@ -101,10 +170,9 @@ async def create_todo(
     Create a todo.
     """
     try:
-        todo = await crud_todo.create(db=db, obj_in=todo_in)
+        todo = await crud_todo.create(db=db, obj_in=todo_in, commit=False)
         await crud_todo.update_users(db=db, todo_in=todo_in, todo=todo)
         await db.commit()
-        await db.refresh(todo)
     except Exception as e:
         await db.rollback()
         log.exception(e)
@@ -113,6 +181,72 @@ async def create_todo(
     return todo
 
 
+@router.post(
+    "/bulk",
+    response_model=BulkResult[TodoRead],
+)
+async def create_todos(
+    *,
+    db: session_dep,
+    todos_in: list[TodoCreate],
+) -> Any:
+    """
+    Create todos in bulk. Users are not linked, use PUT /todo/{_id} for that.
+    """
+    if len(todos_in) > settings.MAX_BULK_SIZE:
+        raise_400(msg=f"Bulk operations are limited to {settings.MAX_BULK_SIZE} items")
+    try:
+        return await crud_todo.create_many(db=db, objs_in=todos_in)
+    except Exception as e:
+        await db.rollback()
+        log.exception(e)
+        raise_500()
+
+
+@router.patch(
+    "/bulk",
+    response_model=BulkResult[TodoRead],
+)
+async def update_todos(
+    *,
+    db: session_dep,
+    todos_in: list[TodoUpdateMany],
+) -> Any:
+    """
+    Update todos in bulk, only the fields set on each item are updated.
+    """
+    if len(todos_in) > settings.MAX_BULK_SIZE:
+        raise_400(msg=f"Bulk operations are limited to {settings.MAX_BULK_SIZE} items")
+    try:
+        return await crud_todo.update_many(db=db, objs_in=todos_in)
+    except Exception as e:
+        await db.rollback()
+        log.exception(e)
+        raise_500()
+
+
+@router.delete(
+    "/bulk",
+    response_model=BulkResult[int],
+)
+async def delete_todos(
+    *,
+    db: session_dep,
+    ids: list[int],
+) -> Any:
+    """
+    Delete todos in bulk, returns the deleted ids.
+    """
+    if len(ids) > settings.MAX_BULK_SIZE:
+        raise_400(msg=f"Bulk operations are limited to {settings.MAX_BULK_SIZE} items")
+    try:
+        return await crud_todo.delete_many(db=db, ids=ids)
+    except Exception as e:
+        await db.rollback()
+        log.exception(e)
+        raise_500()
+
+
 @router.put(
     "/{_id}",
     response_model=TodoRead,
@@ -126,18 +260,38 @@ async def update_todo(
     """
     Update a todo.
     """
-    todo = await crud_todo.get(db=db, id=_id)
-    if not todo:
-        raise_404()
+    return await patch_todo_by_id(db, _id, todo_in)
+
+
+@router.patch(
+    "/{_id}",
+    response_model=TodoRead,
+)
+async def patch_todo(
+    *,
+    db: session_dep,
+    _id: int,
+    todo_in: TodoPatch,
+) -> Any:
+    """
+    Update the fields set in the body of a todo, the others are left unchanged.
+    """
+    return await patch_todo_by_id(db, _id, todo_in)
+
+
+async def patch_todo_by_id(db: session_dep, _id: int, todo_in: TodoUpdate | TodoPatch) -> Todo:
     try:
-        todo = await crud_todo.update(db=db, db_obj=todo, obj_in=todo_in)
-        await crud_todo.update_users(db=db, todo_in=todo_in, todo=todo)
-        await db.commit()
-        await db.refresh(todo)
+        todo = await crud_todo.patch_by_id(db=db, id=_id, obj_in=todo_in, commit=False)
+        if todo:
+            await crud_todo.update_users(db=db, todo_in=todo_in, todo=todo)
+            await db.commit()
     except Exception as e:
+        await db.rollback()
         log.exception(e)
         raise_500()
 
+    if not todo:
+        raise_404()
     return todo
 
 
@@ -147,16 +301,32 @@ async def update_todo(
 )
 async def read_todo(
     *,
-    db: session_dep,
+    db: read_session_dep,
+    request: Request,
+    response: Response,
     _id: int,
+    fields: list[str] | None = Depends(parse_fields_param),
 ) -> Any:
     """
     Get todo by ID.
     """
-    todo = await crud_todo.get(db=db, id=_id)
+    # Revalidation only reads updated_at
+    if is_conditional(request):
+        updated_at = await crud_todo.get_updated_at(db, _id)
+        if updated_at is None:
+            raise_404()
+        headers = validators(request, updated_at, last_modified=updated_at)
+        if unchanged := not_modified(request, headers):
+            return unchanged
+
+    todo = await crud_todo.get(db=db, id=_id, fields=fields)
     if not todo:
         raise_404()
 
+    headers = validators(request, todo.updated_at, last_modified=todo.updated_at)
+    response.headers.update(headers)
+    if fields:
+        return sparse_response(todo, TodoRead, fields, headers)
     return todo
 
 
@@ -166,13 +336,13 @@ async def read_todo(
 )
 async def read_todo_users(
     *,
-    db: session_dep,
+    db: read_session_dep,
     _id: int,
 ) -> Todo:
     """
     Get user linked to a todo by todo ID.
     """
-    todo = await crud_todo.get(db=db, id=_id)
+    todo = await crud_todo.get(db=db, id=_id, options=[selectinload(Todo.users)])
     if not todo:
         raise_404()
 
@@ -191,14 +361,13 @@ async def delete_todo(
     """
     Delete a todo.
     """
-    todo = await crud_todo.get(db=db, id=_id)
-    if not todo:
-        raise_404()
-
     try:
-        todo = await crud_todo.remove(db=db, db_obj=todo)
+        todo = await crud_todo.delete_by_id(db=db, id=_id)
     except Exception as e:
+        await db.rollback()
         log.exception(e)
         raise_500()
 
+    if not todo:
+        raise_404()
     return todo
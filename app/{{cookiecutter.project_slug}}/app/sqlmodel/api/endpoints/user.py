@@ -1,14 +1,25 @@
 from typing import Any
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from starlette.responses import Response, StreamingResponse
 
-from app.api.deps import raise_404, raise_500
+from app.api.conditional import is_conditional, not_modified, validators
+from app.api.deps import raise_400, raise_404, raise_500, sparse_response
 from app.core.cloud_logging import log
-from app.models.base import Page
-from app.sqlmodel.api.deps import parse_query_filter_params, session_dep
+from app.core.config import settings
+from app.models.base import BulkResult, Page
+from app.sqlmodel.api.deps import (
+    parse_fields_param,
+    parse_query_filter_params,
+    read_session_dep,
+    read_session_factory_dep,
+    session_dep,
+)
+from app.sqlmodel.crud.base import CountMode
 from app.sqlmodel.crud.user import users as crud_user
 from app.sqlmodel.models.base import QueryFilter
-from app.sqlmodel.models.user import User, UserCreate, UserRead
+from app.sqlmodel.models.user import User, UserCreate, UserRead, UserUpdateMany
+from app.utils.export import ExportFormat, export_response
 
 router = APIRouter()
 
@@ -19,18 +30,32 @@ router = APIRouter()
 )
 async def read_users(
     *,
-    db: session_dep,
+    db: read_session_dep,
+    request: Request,
+    response: Response,
     page: int | None = 1,
     per_page: int | None = 20,
     sort: str | None = None,
     filters: list[QueryFilter] = Depends(parse_query_filter_params),
     is_desc: bool = False,
     use_or: bool = False,
+    cursor: str | None = None,
+    count: CountMode = "exact",
+    fields: list[str] | None = Depends(parse_fields_param),
 ) -> Page[User]:
     """
     Retrieve user.
     """
     try:
+        # Lists only have an ETag, a DELETE leaves max(updated_at) and so Last-Modified as is.
+        # The version is only queried to answer If-None-Match, else it is sent when the
+        # page query computed it, see CRUDBase.order_and_paginate_results
+        headers: dict[str, str] = {}
+        if "if-none-match" in request.headers:
+            version = await crud_user.get_multi_version(db, filters=filters, use_or=use_or)
+            headers = validators(request, *version, last_modified=None)
+            if unchanged := not_modified(request, headers):
+                return unchanged
         users = await crud_user.get_multi(
             db,
             page=page,
@@ -39,12 +64,55 @@ async def read_users(
             is_desc=is_desc,
             filters=filters,
             use_or=use_or,
+            cursor=cursor,
+            count=count,
+            fields=fields,
         )
-        return users
+        if not headers and users.version is not None:
+            headers = validators(request, *users.version, last_modified=None)
+    except (AttributeError, KeyError, ValueError) as e:
+        log.exception(e)
+        raise_400()
     except Exception as e:
         log.exception(e)
         raise_500()
 
+    response.headers.update(headers)
+    if fields:
+        return sparse_response(users, UserRead, fields, headers)
+    return users
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+)
+async def export_users(
+    *,
+    session_factory: read_session_factory_dep,
+    format: ExportFormat = "ndjson",
+    sort: str | None = None,
+    filters: list[QueryFilter] = Depends(parse_query_filter_params),
+    is_desc: bool = False,
+    use_or: bool = False,
+) -> StreamingResponse:
+    """
+    Export all the users matching the filters, streamed as NDJSON or CSV.
+    """
+    try:
+        statement = crud_user.select_filtered(filters, use_or)
+    except (AttributeError, KeyError, ValueError) as e:
+        log.exception(e)
+        raise_400()
+
+    async def chunks():
+        # The response is streamed after the endpoint returned, it needs its own session
+        async with session_factory() as db:
+            async for chunk in crud_user.stream(db, statement, sort=sort, is_desc=is_desc):
+                yield chunk
+
+    return export_response(chunks(), UserRead, format, "users")
+
 
 @router.post(
     "",
@@ -67,20 +135,102 @@ async def create_user(
     return user
 
 
+@router.post(
+    "/bulk",
+    response_model=BulkResult[UserRead],
+)
+async def create_users(
+    *,
+    db: session_dep,
+    users_in: list[UserCreate],
+) -> Any:
+    """
+    Create users in bulk.
+    """
+    if len(users_in) > settings.MAX_BULK_SIZE:
+        raise_400(msg=f"Bulk operations are limited to {settings.MAX_BULK_SIZE} items")
+    try:
+        return await crud_user.create_many(db=db, objs_in=users_in)
+    except Exception as e:
+        await db.rollback()
+        log.exception(e)
+        raise_500()
+
+
+@router.patch(
+    "/bulk",
+    response_model=BulkResult[UserRead],
+)
+async def update_users(
+    *,
+    db: session_dep,
+    users_in: list[UserUpdateMany],
+) -> Any:
+    """
+    Update users in bulk, only the fields set on each item are updated.
+    """
+    if len(users_in) > settings.MAX_BULK_SIZE:
+        raise_400(msg=f"Bulk operations are limited to {settings.MAX_BULK_SIZE} items")
+    try:
+        return await crud_user.update_many(db=db, objs_in=users_in)
+    except Exception as e:
+        await db.rollback()
+        log.exception(e)
+        raise_500()
+
+
+@router.delete(
+    "/bulk",
+    response_model=BulkResult[int],
+)
+async def delete_users(
+    *,
+    db: session_dep,
+    ids: list[int],
+) -> Any:
+    """
+    Delete users in bulk, returns the deleted ids.
+    """
+    if len(ids) > settings.MAX_BULK_SIZE:
+        raise_400(msg=f"Bulk operations are limited to {settings.MAX_BULK_SIZE} items")
+    try:
+        return await crud_user.delete_many(db=db, ids=ids)
+    except Exception as e:
+        await db.rollback()
+        log.exception(e)
+        raise_500()
+
+
 @router.get(
     "/{_id}",
     response_model=UserRead,
 )
 async def read_user(
     *,
-    db: session_dep,
+    db: read_session_dep,
+    request: Request,
+    response: Response,
     _id: int,
+    fields: list[str] | None = Depends(parse_fields_param),
 ) -> Any:
     """
     Get user by ID
     """
-    user = await crud_user.get(db=db, id=_id)
+    # Revalidation only reads updated_at
+    if is_conditional(request):
+        updated_at = await crud_user.get_updated_at(db, _id)
+        if updated_at is None:
+            raise_404()
+        headers = validators(request, updated_at, last_modified=updated_at)
+        if unchanged := not_modified(request, headers):
+            return unchanged
+
+    user = await crud_user.get(db=db, id=_id, fields=fields)
     if not user:
         raise_404()
 
+    headers = validators(request, user.updated_at, last_modified=user.updated_at)
+    response.headers.update(headers)
+    if fields:
+        return sparse_response(user, UserRead, fields, headers)
     return user
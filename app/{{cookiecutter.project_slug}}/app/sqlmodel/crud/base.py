@@ -1,32 +1,203 @@
-from typing import Any, Generic, TypeVar
+import asyncio
+import base64
+import binascii
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from datetime import date, datetime
+from typing import Any, Generic, Literal, TypeVar
 
-from sqlalchemy import VARCHAR, Enum, asc, cast, desc, func, or_, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from sqlalchemy import (
+    ClauseElement,
+    ColumnElement,
+    Executable,
+    Integer,
+    and_,
+    any_,
+    asc,
+    bindparam,
+    delete,
+    desc,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import ColumnProperty, InstrumentedAttribute, load_only, raiseload
+from sqlalchemy.sql.base import ExecutableOption
 from sqlalchemy.sql.expression import Select
 from sqlmodel import SQLModel, select
 
-from app.models.base import Page
+from app.core.config import settings
+from app.models.base import BulkError, BulkResult, Page
+from app.sqlmodel.crud.cache import MISSING, QueryCache, detached_copy
+from app.sqlmodel.crud.filters import FilterCompiler
 from app.sqlmodel.models.base import QueryFilter, TableBase, to_snake
 
+T = TypeVar("T")
 ModelType = TypeVar("ModelType", bound=TableBase)
 CreateModelType = TypeVar("CreateModelType", bound=SQLModel)
 UpdateModelType = TypeVar("UpdateModelType", bound=SQLModel)
 
+CountMode = Literal["exact", "estimated", "none"]
+PaginationExecution = Literal["sequential", "concurrent", "window"]
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a statement, keeping its bound parameters"""
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def compile_explain(element: Explain, compiler, **kw) -> str:
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}"
+
+
+def encode_cursor(sort: str, is_desc: bool, values: list[Any]) -> str:
+    """Build an opaque cursor from the sort key values of the last row of a page"""
+    payload = {"sort": sort, "is_desc": is_desc, "values": jsonable_encoder(values)}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str, is_desc: bool) -> list[Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        values = payload["values"]
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if payload.get("sort") != sort or payload.get("is_desc") != is_desc:
+        raise ValueError("Cursor does not match the requested sort")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def id_in(column: InstrumentedAttribute, ids: Sequence[int]) -> ColumnElement[bool]:
+    """
+    `column = ANY(:ids)`: a single array parameter, so the SQL text (and the prepared
+    statement) is the same whatever the number of ids
+    """
+    return column == any_(bindparam(None, list(ids), type_=ARRAY(Integer)))
+
+
+def coerce_to_column(attribute: InstrumentedAttribute, value: Any) -> Any:
+    """Convert a JSON decoded value back to the python type of the column"""
+    if value is None:
+        return None
+    try:
+        python_type = attribute.type.python_type
+    except NotImplementedError:
+        return value
+    if isinstance(value, python_type):
+        return value
+    if issubclass(python_type, datetime):
+        return datetime.fromisoformat(value)
+    if issubclass(python_type, date):
+        return date.fromisoformat(value)
+    return python_type(value)
+
 
 class CRUDBase(Generic[ModelType, CreateModelType, UpdateModelType]):
-    def __init__(self, model: type[ModelType]):
+    def __init__(
+        self,
+        model: type[ModelType],
+        filterable_fields: list[str] | None = None,
+        cache_size: int | None = None,
+    ):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
         **Parameters**
         * `model`: A SQLModel class
+        * `filterable_fields`: Columns allowed in query filters, all the columns when None
+        * `cache_size`: Entries of the query result cache, 0 disables it.
+          Defaults to the QUERY_CACHE_* settings
         """
         self.model = model
+        self.columns = {attribute.key: attribute for attribute in inspect(model).column_attrs}
+        # Columns written on insert, primary key and server generated values are left to the DB
+        self.insert_columns = [
+            key
+            for key, attribute in self.columns.items()
+            if not attribute.columns[0].primary_key and attribute.columns[0].server_default is None
+        ]
+        self.filter_compiler = FilterCompiler(model, filterable_fields)
+        # Relationships are not loaded unless requested with `options`, e.g. selectinload,
+        # and accessing them raises instead of emitting a lazy query
+        self.default_options: tuple[ExecutableOption, ...] = (raiseload("*"),)
+
+        if cache_size is None and settings.QUERY_CACHE_ENABLED:
+            cache_size = settings.QUERY_CACHE_SIZES.get(
+                model.__tablename__, settings.QUERY_CACHE_SIZE
+            )
+        self.cache = QueryCache(cache_size, settings.QUERY_CACHE_TTL) if cache_size else None
+
+    async def cached(self, db: AsyncSession, key: tuple, query: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run `query` through the result cache, keyed by `key`.
+        The cache holds detached copies, callers get instances merged into `db` without SQL.
+        """
+        if self.cache is None:
+            return await query()
+
+        value = self.cache.get(key)
+        if value is MISSING:
+            value = await query()
+            if isinstance(value, Page):
+                self.cache.set(
+                    key,
+                    value.model_copy(
+                        update={"items": [detached_copy(item) for item in value.items]}
+                    ),
+                )
+            else:
+                self.cache.set(key, value if value is None else detached_copy(value))
+            return value
+
+        if isinstance(value, Page):
+            items = [await db.merge(item, load=False) for item in value.items]
+            return value.model_copy(update={"items": items})
+        return value if value is None else await db.merge(value, load=False)
 
-    async def get(self, db: AsyncSession, id: int) -> ModelType | None:
+    def invalidate_cache(self, db: AsyncSession) -> None:
+        """Called by every write, the cache is cleared now and again when `db` commits"""
+        if self.cache is not None:
+            self.cache.invalidate(db.sync_session)
+
+    async def get(
+        self,
+        db: AsyncSession,
+        id: int,
+        *,
+        fields: list[str] | None = None,
+        options: Sequence[ExecutableOption] | None = None,
+    ) -> ModelType | None:
         statement = select(self.model).where(self.model.id == id)
-        return (await db.scalars(statement)).first()
+        statement = statement.options(*(self.default_options if options is None else options))
+        if fields:
+            statement = statement.options(self.load_only(fields))
+
+        async def query() -> ModelType | None:
+            return (await db.scalars(statement)).first()
+
+        # Results loading relationships are not cached, their rows would not be invalidated
+        if options is not None:
+            return await query()
+        return await self.cached(db, ("get", id, tuple(fields or ())), query)
 
-    def get_multi(
+    async def get_multi(
         self,
         db: AsyncSession,
         *,
@@ -36,23 +207,131 @@ class CRUDBase(Generic[ModelType, CreateModelType, UpdateModelType]):
         filters: list[QueryFilter] | None = [],
         is_desc: bool = False,
         use_or: bool = False,
+        cursor: str | None = None,
+        count: CountMode = "exact",
+        execution: PaginationExecution | None = None,
+        fields: list[str] | None = None,
+        options: Sequence[ExecutableOption] | None = None,
     ) -> Page[ModelType]:
+        """
+        Paginate with OFFSET by default. Passing a `cursor` (an empty string for the first page)
+        switches to keyset pagination: rows are seeked after the `next_cursor` of the previous page,
+        so every page costs the same whatever its depth.
+        `count` selects how `total` is computed, see `count_results`.
+        `fields` restricts the loaded columns, others raise if accessed.
+        `options` are the relationship loaders, see `default_options`.
+        """
+        statement = self.select_filtered(filters, use_or)
+        statement = statement.options(*(self.default_options if options is None else options))
+        if fields:
+            statement = statement.options(self.load_only(fields, sort))
+
+        def query() -> Awaitable[Page[ModelType]]:
+            return self.order_and_paginate_results(
+                statement,
+                db,
+                page=page,
+                per_page=per_page,
+                sort=sort,
+                is_desc=is_desc,
+                cursor=cursor,
+                count=count,
+                execution=execution,
+            )
+
+        if options is not None:
+            return await query()
+        # The order of AND/OR conditions does not change the result
+        signature = sorted((f.field, f.operator, repr(f.value)) for f in filters or ())
+        key = (
+            "get_multi",
+            page,
+            per_page,
+            sort,
+            is_desc,
+            use_or,
+            tuple(signature),
+            cursor,
+            count,
+            execution,
+            tuple(fields or ()),
+        )
+        return await self.cached(db, key, query)
+
+    async def get_updated_at(self, db: AsyncSession, id: int) -> datetime | None:
+        """Version of an object, None when it does not exist"""
+        return await db.scalar(select(self.model.updated_at).where(self.model.id == id))
+
+    async def get_multi_version(
+        self,
+        db: AsyncSession,
+        *,
+        filters: list[QueryFilter] | None = None,
+        use_or: bool = False,
+    ) -> tuple[datetime | None, int]:
+        """
+        Version of a filtered set, `(max(updated_at), count)`,
+        which changes when a row is created, updated or deleted.
+        The window execution of `get_multi` computes it with the page as `Page.version`.
+        """
+        statement = select(func.max(self.model.updated_at), func.count()).select_from(self.model)
+        if filters:
+            statement = self.update_query_with_filters_(statement, filters, use_or)
+        row = (await db.execute(statement)).one()
+        return row[0], row[1]
+
+    def load_only(self, fields: list[str], sort: str | None = None) -> ExecutableOption:
+        """
+        Only load the requested columns, plus the id and the sort column needed by pagination,
+        and updated_at which versions the response.
+        Fields which are not columns are ignored.
+        """
+        keys = {"id", "updated_at", *(to_snake(field) for field in fields)}
+        if sort_field := self.get_sort_field(sort):
+            keys.add(sort_field.key)
+        columns = [self.columns[key].class_attribute for key in keys if key in self.columns]
+        return load_only(*columns, raiseload=True)
+
+    def select_filtered(
+        self, filters: list[QueryFilter] | None = None, use_or: bool = False
+    ) -> Select:
         statement = select(self.model)
         if filters:
             statement = self.update_query_with_filters_(statement, filters, use_or)
+        return statement
 
-        return self.order_and_paginate_results(
-            statement, db, page=page, per_page=per_page, sort=sort, is_desc=is_desc
-        )
+    async def stream(
+        self,
+        db: AsyncSession,
+        statement: Select,
+        *,
+        sort: str | None = None,
+        is_desc: bool = False,
+        chunk_size: int = settings.EXPORT_CHUNK_SIZE,
+    ) -> AsyncIterator[Sequence[ModelType]]:
+        """
+        Yield the rows of `statement` by chunks of `chunk_size`, read from a server-side cursor,
+        so memory does not depend on the number of rows.
+        """
+        sort_field = self.get_sort_field(sort)
+        if sort_field is not None:
+            statement = statement.order_by(desc(sort_field) if is_desc else asc(sort_field))
+
+        result = await db.stream_scalars(statement.execution_options(yield_per=chunk_size))
+        async for chunk in result.partitions():
+            yield chunk
 
     async def create(
         self, db: AsyncSession, *, obj_in: CreateModelType, commit: bool = True
     ) -> ModelType:
         db_obj = self.model.model_validate(obj_in)
         db.add(db_obj)
+        # The INSERT returns the server generated id and timestamps (eager defaults),
+        # and the session does not expire them on commit, so no refresh is needed
+        await db.flush()
+        self.invalidate_cache(db)
         if commit:
-            await db.commit()  # to move out of function?
-            await db.refresh(db_obj)
+            await db.commit()
         return db_obj
 
     async def update(
@@ -70,23 +349,226 @@ class CRUDBase(Generic[ModelType, CreateModelType, UpdateModelType]):
         for field in update_data:
             snake_field = to_snake(field)
             if snake_field in update_data:
-                # Lists must be managed manually
-                if isinstance(update_data[snake_field], list):
+                # Lists and relationship ids (e.g. users_id) must be managed manually
+                if isinstance(update_data[snake_field], list) or snake_field not in self.columns:
                     continue
                 setattr(db_obj, snake_field, update_data[snake_field])
 
         db.add(db_obj)
+        # The UPDATE returns the new updated_at
+        await db.flush()
+        self.invalidate_cache(db)
         if commit:
-            await db.commit()  # to move out of function?
-            await db.refresh(db_obj)
+            await db.commit()
+        return db_obj
+
+    async def patch_by_id(
+        self,
+        db: AsyncSession,
+        *,
+        id: int,
+        obj_in: UpdateModelType | dict[str, Any],
+        commit: bool = True,
+    ) -> ModelType | None:
+        """
+        Update the set fields of an object with a single UPDATE ... RETURNING,
+        without loading it first. Returns None when no row has this id.
+        """
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.model_dump(exclude_unset=True)
+        # Lists and relationship ids (e.g. users_id) must be managed manually
+        values = {
+            to_snake(field): value
+            for field, value in update_data.items()
+            if to_snake(field) in self.columns
+            and to_snake(field) != "id"
+            and not isinstance(value, list)
+        }
+        if not values:
+            return await self.get(db, id)
+
+        statement = (
+            update(self.model)
+            .where(self.model.id == id)
+            .values(**values)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        db_obj = (await db.scalars(statement)).one_or_none()
+        self.invalidate_cache(db)
+        if commit and db_obj is not None:
+            await db.commit()
+        return db_obj
+
+    async def delete_by_id(
+        self, db: AsyncSession, *, id: int, commit: bool = True
+    ) -> ModelType | None:
+        """
+        Delete an object with a single DELETE ... RETURNING, without loading it first.
+        Returns the deleted row, or None when no row has this id.
+        """
+        await self.delete_links(db, [id])
+        statement = delete(self.model).where(self.model.id == id).returning(self.model)
+        db_obj = (await db.scalars(statement)).one_or_none()
+        self.invalidate_cache(db)
+        if commit and db_obj is not None:
+            await db.commit()
         return db_obj
 
     async def remove(self, db: AsyncSession, *, db_obj: ModelType, commit: bool = True) -> str:
         await db.delete(db_obj)
+        self.invalidate_cache(db)
         if commit:
             await db.commit()
         return db_obj
 
+    async def create_many(
+        self, db: AsyncSession, *, objs_in: list[CreateModelType], commit: bool = True
+    ) -> BulkResult[ModelType]:
+        """
+        Insert all the objects with multi-row INSERT ... RETURNING statements.
+        Invalid items are reported in `errors` and the others are still inserted.
+        """
+        batch, errors = [], []
+        for index, obj_in in enumerate(objs_in):
+            try:
+                db_obj = self.model.model_validate(obj_in)
+            except ValidationError as e:
+                errors.append(BulkError(index=index, msg=str(e)))
+                continue
+            batch.append((index, {key: getattr(db_obj, key) for key in self.insert_columns}))
+
+        async def execute(rows: list[dict[str, Any]]) -> list[ModelType]:
+            statement = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+            return (await db.scalars(statement, rows)).all()
+
+        items, db_errors = await self.execute_in_savepoints(db, batch, execute)
+        self.invalidate_cache(db)
+        if commit:
+            await db.commit()
+        return BulkResult(items=items, errors=sorted(errors + db_errors, key=lambda e: e.index))
+
+    async def update_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: list[UpdateModelType | dict[str, Any]],
+        commit: bool = True,
+    ) -> BulkResult[ModelType]:
+        """
+        Update objects identified by their `id` with an executemany UPDATE.
+        Unknown ids are reported in `errors`.
+        """
+        batch, errors = [], []
+        for index, obj_in in enumerate(objs_in):
+            if isinstance(obj_in, dict):
+                update_data = obj_in
+            else:
+                update_data = obj_in.model_dump(exclude_unset=True)
+            # Lists must be managed manually
+            row = {
+                to_snake(field): value
+                for field, value in update_data.items()
+                if to_snake(field) in self.columns and not isinstance(value, list)
+            }
+            if row.get("id") is None:
+                errors.append(BulkError(index=index, msg="Missing id"))
+                continue
+            batch.append((index, row))
+
+        ids = [row["id"] for _, row in batch]
+        existing = set(await db.scalars(select(self.model.id).where(id_in(self.model.id, ids))))
+        errors.extend(
+            BulkError(index=index, id=row["id"], msg="Not found.")
+            for index, row in batch
+            if row["id"] not in existing
+        )
+        batch = [(index, row) for index, row in batch if row["id"] in existing]
+
+        async def execute(rows: list[dict[str, Any]]) -> list[int]:
+            # ORM bulk UPDATE by primary key, sent as a single executemany
+            await db.execute(update(self.model), rows)
+            return [row["id"] for row in rows]
+
+        updated, db_errors = await self.execute_in_savepoints(db, batch, execute)
+        statement = (
+            select(self.model)
+            .where(id_in(self.model.id, updated))
+            .execution_options(populate_existing=True)
+        )
+        items = (await db.scalars(statement)).all() if updated else []
+        self.invalidate_cache(db)
+        if commit:
+            await db.commit()
+        return BulkResult(items=items, errors=sorted(errors + db_errors, key=lambda e: e.index))
+
+    async def delete_many(
+        self, db: AsyncSession, *, ids: list[int], commit: bool = True
+    ) -> BulkResult[int]:
+        """Delete objects by id with DELETE ... WHERE id = ANY(:ids), returns the deleted ids"""
+
+        async def execute(batch_ids: list[int]) -> list[int]:
+            await self.delete_links(db, batch_ids)
+            statement = (
+                delete(self.model)
+                .where(id_in(self.model.id, batch_ids))
+                .returning(self.model.id)
+                .execution_options(synchronize_session=False)
+            )
+            return (await db.scalars(statement)).all()
+
+        deleted, errors = await self.execute_in_savepoints(db, list(enumerate(ids)), execute)
+        deleted = set(deleted)
+        failed = {error.index for error in errors}
+        errors.extend(
+            BulkError(index=index, id=id, msg="Not found.")
+            for index, id in enumerate(ids)
+            if id not in deleted and index not in failed
+        )
+        self.invalidate_cache(db)
+        if commit:
+            await db.commit()
+        return BulkResult(
+            items=[id for id in dict.fromkeys(ids) if id in deleted],
+            errors=sorted(errors, key=lambda e: e.index),
+        )
+
+    async def delete_links(self, db: AsyncSession, ids: list[int]) -> None:
+        """
+        Delete the rows referencing objects about to be deleted, for foreign keys without
+        ON DELETE CASCADE. Runs in the same transaction or savepoint as the DELETE.
+        """
+
+    async def execute_in_savepoints(
+        self,
+        db: AsyncSession,
+        batch: list[tuple[int, T]],
+        execute: Callable[[list[T]], Awaitable[list[Any]]],
+    ) -> tuple[list[Any], list[BulkError]]:
+        """
+        Run the whole batch in one savepoint. Only when the database rejects it,
+        replay it item by item to report which items failed and keep the others.
+        """
+        if not batch:
+            return [], []
+        try:
+            async with db.begin_nested():
+                return list(await execute([item for _, item in batch])), []
+        except DBAPIError:
+            pass
+
+        results, errors = [], []
+        for index, item in batch:
+            try:
+                async with db.begin_nested():
+                    results.extend(await execute([item]))
+            except DBAPIError as e:
+                id = item.get("id") if isinstance(item, dict) else item
+                errors.append(BulkError(index=index, id=id, msg=str(e.orig)))
+        return results, errors
+
     async def order_and_paginate_results(
         self,
         statement: Select,
@@ -96,94 +578,194 @@ class CRUDBase(Generic[ModelType, CreateModelType, UpdateModelType]):
         per_page: int = 10,
         sort: str | None = None,
         is_desc: bool = False,
+        cursor: str | None = None,
+        count: CountMode = "exact",
+        execution: PaginationExecution | None = None,
     ) -> Page[ModelType]:
-        if sort:
-            sort = to_snake(sort)
-            try:
-                sort_field = getattr(self.model, sort)
-                statement = statement.order_by(desc(sort_field) if is_desc else asc(sort_field))
-            except AttributeError:
-                pass
+        """
+        `execution` selects how the exact count and the items are fetched, defaults to
+        `settings.PAGINATION_EXECUTION`:
+        * `sequential`: count query, then items query on the request session
+        * `concurrent`: count on a second connection of the same engine while the items are
+          fetched, sequential when `db` is bound to a single connection
+        * `window`: a single statement, the total comes from `count(*) OVER ()`
+        """
+        sort_field = self.get_sort_field(sort)
+        count_statement = statement
+        execution = execution or settings.PAGINATION_EXECUTION
 
-        count_stmt = select(func.count()).select_from(statement.subquery())
-        total = await db.scalar(count_stmt)
+        keys: list[InstrumentedAttribute] = []
+        if cursor is not None:
+            # The id is always the last sort key, so that the (sort, id) position of a row is unique
+            keys = [self.model.id] if sort_field is None else [sort_field, self.model.id]
+            statement = self.apply_cursor(statement, cursor, keys, is_desc)
+        elif sort_field is not None:
+            # Ties broken by id as in the cursor pages, so that rows keep their page
+            order = desc if is_desc else asc
+            statement = statement.order_by(order(sort_field), order(self.model.id))
 
-        # Apply pagination
-        if per_page > 0:
-            statement = statement.limit(per_page)
-        statement = statement.offset((page - 1) * per_page)
+        # Apply pagination, fetching one extra row to know if there is a next page.
+        # Unbounded pages are capped, exports are served by `stream`
+        if per_page <= 0 or per_page > settings.MAX_PAGE_SIZE:
+            per_page = settings.MAX_PAGE_SIZE
+        statement = statement.limit(per_page + 1)
+        if cursor is None:
+            statement = statement.offset((page - 1) * per_page)
 
-        items = (await db.scalars(statement)).all()
+        if count != "exact":
+            execution = "sequential"
+        elif execution == "concurrent" and not isinstance(db.bind, AsyncEngine):
+            # The session is pinned to a connection, there is no second one to count on
+            execution = "sequential"
+        elif execution == "window" and cursor is not None:
+            # The seek predicate would restrict the window count to the rows after the cursor
+            execution = "sequential"
 
-        return Page(items=items, total=total)
+        version = None
+        if execution == "window":
+            # The version of the set comes with its total, see get_multi_version
+            windows = [func.count().over(), func.max(self.model.updated_at).over()]
+            rows = (await db.execute(statement.add_columns(*windows))).all()
+            items = [row[0] for row in rows]
+            if rows:
+                total = rows[0][1]
+                version = (rows[0][2], total)
+            elif page > 1:
+                # Out of range page, the window function has no row to report the total on
+                total = await self.count_results(count_statement, db, count=count)
+            else:
+                total = 0
+                version = (None, 0)
+        elif execution == "concurrent":
+            # Checked out before the gather, `db` does not support concurrent operations
+            connection = await db.connection()
+            total, items = await asyncio.gather(
+                self.count_in_new_session(count_statement, connection, count=count),
+                self.fetch_items(statement, db),
+            )
+        else:
+            total = await self.count_results(count_statement, db, count=count)
+            items = await self.fetch_items(statement, db)
 
-    def update_query_with_filters_(
-        self, statement: Select, query_filters: list[QueryFilter], use_or=False
-    ) -> Select:
-        operator_matcher = {
-            "alchemy_func": {
-                "=": "__eq__",
-                "!=": "__ne__",
-                ">": "__gt__",
-                "<": "__lt__",
-                ">=": "__ge__",
-                "<=": "__le__",
-                ":": "like",
-                "in": "in_",
-                "not_in": "notin_",
-                "is_null": "is_",
-                "is_not_null": "is_not",
-            },
-            "built_in": {
-                "is_empty": '== ""',
-                "is_not_empty": '!= ""',
-                "is_true": "== True",
-                "is_false": "== False",
-            },
-        }
-        statement = self.manage_operators(statement, query_filters, operator_matcher, use_or)
+        has_next = len(items) > per_page
+        if has_next:
+            items = items[:per_page]
 
-        return statement
+        next_cursor = None
+        if keys and has_next:
+            last = items[-1]
+            next_cursor = encode_cursor(
+                ",".join(key.key for key in keys),
+                is_desc,
+                [getattr(last, key.key) for key in keys],
+            )
 
-    def manage_operators(
-        self,
-        statement: Select,
-        query_filters: list[QueryFilter],
-        operator_matcher: dict,
-        use_or: bool = False,
+        result = Page(items=items, total=total, has_next=has_next, next_cursor=next_cursor)
+        result._version = version
+        return result
+
+    async def fetch_items(self, statement: Select, db: AsyncSession) -> list[ModelType]:
+        return (await db.scalars(statement)).all()
+
+    async def count_in_new_session(
+        self, statement: Select, connection: AsyncConnection, *, count: CountMode = "exact"
+    ) -> int | None:
+        """
+        Count on a second connection of the engine of the request `connection`, a replica
+        for read sessions and READ ONLY like it, so it can run while the request session
+        fetches the items. It only sees committed rows.
+        """
+        readonly = connection.sync_connection.get_execution_options().get(
+            "postgresql_readonly", False
+        )
+        async with AsyncSession(bind=connection.engine, expire_on_commit=False) as session:
+            await session.connection(execution_options={"postgresql_readonly": readonly})
+            return await self.count_results(statement, session, count=count)
+
+    async def count_results(
+        self, statement: Select, db: AsyncSession, *, count: CountMode = "exact"
+    ) -> int | None:
+        """
+        * `exact`: count(*) over the filtered statement
+        * `estimated`: planner statistics, falls back to `exact` when no statistics exist yet
+        * `none`: skip counting, clients rely on `has_next`
+        """
+        if count == "none":
+            return None
+        if count == "estimated":
+            estimate = await self.estimate_count(statement, db)
+            if estimate is not None:
+                return estimate
+
+        count_stmt = select(func.count()).select_from(statement.subquery())
+        return await db.scalar(count_stmt)
+
+    async def estimate_count(self, statement: Select, db: AsyncSession) -> int | None:
+        if statement.whereclause is None:
+            # Unfiltered: row count maintained by VACUUM/ANALYZE, -1 if never analyzed
+            table = db.get_bind().dialect.identifier_preparer.format_table(self.model.__table__)
+            reltuples = await db.scalar(
+                text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:table)"),
+                {"table": table},
+            )
+            return int(reltuples) if reltuples is not None and reltuples >= 0 else None
+
+        plan = await db.scalar(Explain(statement))
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    def apply_cursor(
+        self, statement: Select, cursor: str, keys: list[InstrumentedAttribute], is_desc: bool
     ) -> Select:
-        filter_conditions = []
-        for query_filter in query_filters:
-            attribute = getattr(self.model, query_filter.field)
-            if not attribute:
-                raise AttributeError(
-                    f"{self.model.__name__} has no attribute {query_filter.field}"
-                )
-            # If the attribute is an Enum, cast the column type to VARCHAR
-            # To allow LIKE operations on Enum
-            if isinstance(attribute.property.columns[0].type, Enum):
-                column_casted = cast(attribute, VARCHAR)
-            else:
-                column_casted = attribute
-
-            if query_filter.operator in operator_matcher["alchemy_func"]:
-                operator_value = operator_matcher["alchemy_func"][query_filter.operator]
-                column_operator = getattr(column_casted, operator_value)
-                filter_condition = column_operator(query_filter.value)
-            elif query_filter.operator in operator_matcher["built_in"]:
-                operator_value = operator_matcher["built_in"][query_filter.operator]
-                filter_condition = eval(
-                    f"{column_casted} {operator_value}", {self.model.__name__: self.model}
-                )
-            else:
-                raise ValueError(f"Operator {query_filter.operator} is not supported")
+        if cursor:
+            values = decode_cursor(cursor, ",".join(key.key for key in keys), is_desc)
+            if len(values) != len(keys):
+                raise ValueError("Invalid cursor")
+            try:
+                values = [coerce_to_column(key, value) for key, value in zip(keys, values)]
+            except TypeError:
+                # e.g. an object where the column is a number, crafted or from another sort
+                raise ValueError("Invalid cursor")
+            statement = statement.where(self.seek_predicate(keys, values, is_desc))
 
-            filter_conditions.append(filter_condition)
+        return statement.order_by(*(desc(key) if is_desc else asc(key) for key in keys))
 
-        if use_or:
-            statement = statement.filter(or_(*filter_conditions))
-        else:
-            for condition in filter_conditions:
-                statement = statement.where(condition)
+    def seek_predicate(
+        self, keys: list[InstrumentedAttribute], values: list[Any], is_desc: bool = False
+    ):
+        """
+        WHERE clause selecting the rows placed after `values` in the (sort, id) ordering.
+        PostgreSQL puts NULLs last in ascending order and first in descending order,
+        so nullable sort columns need an extra branch.
+        """
+        if len(keys) == 1:
+            return keys[0] < values[0] if is_desc else keys[0] > values[0]
 
-        return statement
+        sort_field, id_field = keys
+        sort_value, id_value = values
+        if sort_value is None:
+            after_null = id_field < id_value if is_desc else id_field > id_value
+            predicate = and_(sort_field.is_(None), after_null)
+            return or_(predicate, sort_field.is_not(None)) if is_desc else predicate
+
+        row, position = tuple_(sort_field, id_field), tuple_(sort_value, id_value)
+        predicate = row < position if is_desc else row > position
+        if not is_desc and sort_field.property.columns[0].nullable:
+            predicate = or_(predicate, sort_field.is_(None))
+        return predicate
+
+    def get_sort_field(self, sort: str | None) -> InstrumentedAttribute | None:
+        if not sort:
+            return None
+        sort_field = getattr(self.model, to_snake(sort), None)
+        if not isinstance(sort_field, InstrumentedAttribute) or not isinstance(
+            sort_field.property, ColumnProperty
+        ):
+            return None
+        return sort_field
+
+    def update_query_with_filters_(
+        self, statement: Select, query_filters: list[QueryFilter], use_or=False
+    ) -> Select:
+        return self.filter_compiler.apply(statement, query_filters, use_or)
@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+MISSING = object()
+
+# Key of `Session.info` holding the caches to clear once the transaction commits
+PENDING_INVALIDATIONS = "query_cache_invalidations"
+
+
+class QueryCache:
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        LRU cache of query results, entries also expire `ttl` seconds after being stored.
+        Values are stored as is, CRUDBase only stores objects detached from their session.
+        **Parameters**
+        * `maxsize`: Number of entries kept, the least recently used is evicted first
+        * `ttl`: Lifetime of an entry in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value, or MISSING when absent or expired"""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, session: Session | None = None) -> None:
+        """
+        Drop every entry. When a `session` is given, drop them again once it commits,
+        so that reads running before the commit cannot keep stale rows cached.
+        """
+        self.entries.clear()
+        if session is not None:
+            session.info.setdefault(PENDING_INVALIDATIONS, set()).add(self)
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+def detached_copy(obj: Any) -> Any:
+    """
+    Copy of a clean persistent object which belongs to no session, so it can be shared
+    between requests. Only its loaded attributes are copied, no SQL is emitted.
+    """
+    with Session() as session:
+        copy = session.merge(obj, load=False)
+        session.expunge(copy)
+    return copy
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_after_commit(session: Session) -> None:
+    for cache in session.info.pop(PENDING_INVALIDATIONS, ()):
+        cache.invalidate()
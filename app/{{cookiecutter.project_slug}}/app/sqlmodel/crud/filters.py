@@ -0,0 +1,82 @@
+from collections.abc import Callable, Iterable
+from functools import lru_cache, partial
+from typing import Any
+
+from sqlalchemy import VARCHAR, Enum, and_, cast, inspect, or_
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.sql.expression import Select
+from sqlmodel import SQLModel
+
+from app.sqlmodel.models.base import QueryFilter
+
+Predicate = Callable[[Any], ColumnElement[bool]]
+
+# Canonical operators, as normalized by QueryFilter, mapped to their SQL condition builder
+OPERATORS: dict[str, Callable[[ColumnElement, Any], ColumnElement[bool]]] = {
+    "=": lambda column, value: column == value,
+    "!=": lambda column, value: column != value,
+    ">": lambda column, value: column > value,
+    "<": lambda column, value: column < value,
+    ">=": lambda column, value: column >= value,
+    "<=": lambda column, value: column <= value,
+    ":": lambda column, value: column.like(value),
+    "in": lambda column, value: column.in_(value),
+    "not_in": lambda column, value: column.not_in(value),
+    "is_null": lambda column, _: column.is_(None),
+    "is_not_null": lambda column, _: column.is_not(None),
+    "is_empty": lambda column, _: column == "",
+    "is_not_empty": lambda column, _: column != "",
+    "is_true": lambda column, _: column == True,  # noqa: E712
+    "is_false": lambda column, _: column == False,  # noqa: E712
+}
+
+
+class FilterCompiler:
+    def __init__(self, model: type[SQLModel], fields: Iterable[str] | None = None):
+        """
+        Precompute the `(field, operator) -> predicate builder` table of a model,
+        so that applying filters is only dict lookups on the request path.
+        **Parameters**
+        * `model`: A SQLModel table class
+        * `fields`: Columns allowed in filters, all the columns when None
+        """
+        self.model = model
+        columns = {attribute.key for attribute in inspect(model).column_attrs}
+        allowed = columns if fields is None else set(fields)
+        if unknown := allowed - columns:
+            raise AttributeError(f"{model.__name__} has no column {', '.join(sorted(unknown))}")
+
+        self.predicates: dict[tuple[str, str], Predicate] = {}
+        for field in allowed:
+            attribute = getattr(model, field)
+            # If the attribute is an Enum, cast the column type to VARCHAR
+            # To allow LIKE operations on Enum
+            if isinstance(attribute.property.columns[0].type, Enum):
+                column = cast(attribute, VARCHAR)
+            else:
+                column = attribute
+            for operator, builder in OPERATORS.items():
+                self.predicates[(field, operator)] = partial(builder, column)
+
+        self.plan = lru_cache(maxsize=256)(self._plan)
+
+    def _plan(self, signature: tuple[tuple[str, str], ...]) -> tuple[Predicate, ...]:
+        """Resolve and validate a filter shape once, whatever the values"""
+        plan = []
+        for field, operator in signature:
+            predicate = self.predicates.get((field, operator))
+            if predicate is None:
+                if operator not in OPERATORS:
+                    raise ValueError(f"Operator {operator} is not supported")
+                raise AttributeError(f"{self.model.__name__} has no attribute {field}")
+            plan.append(predicate)
+        return tuple(plan)
+
+    def apply(
+        self, statement: Select, query_filters: list[QueryFilter], use_or: bool = False
+    ) -> Select:
+        plan = self.plan(tuple((f.field, f.operator) for f in query_filters))
+        conditions = [predicate(f.value) for predicate, f in zip(plan, query_filters)]
+        if not conditions:
+            return statement
+        return statement.where(or_(*conditions) if use_or else and_(*conditions))
@@ -1,20 +1,50 @@
-from sqlmodel import select
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert
 
 from app.sqlmodel.api.deps import session_dep
-from app.sqlmodel.crud.base import CRUDBase
-from app.sqlmodel.models.todo import Todo, TodoCreate, TodoUpdate
+from app.sqlmodel.crud.base import CRUDBase, id_in
+from app.sqlmodel.models.todo import Todo, TodoCreate, TodoPatch, TodoUpdate
 from app.sqlmodel.models.user import User
+from app.sqlmodel.models.userTodo import UserTodo
 
 
 class CrudTodo(CRUDBase[Todo, TodoCreate, TodoUpdate]):
-    async def update_users(self, db: session_dep, todo_in: TodoCreate, todo: Todo):
+    async def update_users(
+        self, db: session_dep, todo_in: TodoCreate | TodoUpdate | TodoPatch, todo: Todo
+    ):
         """
-        Update many to many relationship if list of users_id specified
+        Update many to many relationship if list of users_id specified.
+        An empty or missing list leaves the links as they are.
+        Only the links to add or remove are written, without loading any User.
         """
-        if todo_in.users_id:
-            statement = select(User).where(User.id.in_(todo_in.users_id))
-            users_list = (await db.scalars(statement)).all()
-            todo.users = [u for u in users_list]
+        if not todo_in.users_id:
+            return
+
+        link = UserTodo.__table__
+        current = set(await db.scalars(select(link.c.user_id).where(link.c.todo_id == todo.id)))
+        wanted = set(todo_in.users_id)
+
+        if added := wanted - current:
+            # Unknown users are skipped by the SELECT, as they were by the previous ORM sync
+            users = select(literal(todo.id), User.id, func.now(), func.now()).where(
+                id_in(User.id, sorted(added))
+            )
+            statement = insert(link).from_select(
+                ["todo_id", "user_id", "created_at", "updated_at"], users
+            )
+            await db.execute(statement.on_conflict_do_nothing())
+
+        if removed := current - wanted:
+            await db.execute(
+                delete(link).where(
+                    link.c.todo_id == todo.id, id_in(link.c.user_id, sorted(removed))
+                )
+            )
+
+    async def delete_links(self, db: session_dep, ids: list[int]) -> None:
+        """Drop the user links first, usertodo has no ON DELETE CASCADE"""
+        link = UserTodo.__table__
+        await db.execute(delete(link).where(id_in(link.c.todo_id, ids)))
 
 
 todos = CrudTodo(Todo)
@@ -1,4 +1,16 @@
-from app.sqlmodel.crud.base import CRUDBase
+from sqlalchemy import delete
+
+from app.sqlmodel.api.deps import session_dep
+from app.sqlmodel.crud.base import CRUDBase, id_in
 from app.sqlmodel.models.user import User, UserCreate, UserUpdate
+from app.sqlmodel.models.userTodo import UserTodo
+
+
+class CrudUser(CRUDBase[User, UserCreate, UserUpdate]):
+    async def delete_links(self, db: session_dep, ids: list[int]) -> None:
+        """Drop the todo links first, usertodo has no ON DELETE CASCADE"""
+        link = UserTodo.__table__
+        await db.execute(delete(link).where(id_in(link.c.user_id, ids)))
+
 
-users = CRUDBase[User, UserCreate, UserUpdate](User)
+users = CrudUser(User)
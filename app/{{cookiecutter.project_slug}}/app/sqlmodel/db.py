@@ -1,8 +1,13 @@
 import contextlib
+import itertools
+import time
+import uuid
 from collections.abc import AsyncIterator
 from typing import Any
 
-from sqlalchemy import AsyncAdaptedQueuePool, NullPool
+from fastapi import Request
+from sqlalchemy import NullPool, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncSession,
@@ -11,7 +16,13 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.orm import declarative_base
 
+from app.core.cloud_logging import log
 from app.core.config import settings
+from app.sqlmodel.instrumentation import (
+    InstrumentedAsyncAdaptedQueuePool,
+    PoolStats,
+    SessionStats,
+)
 
 Base = declarative_base()
 
@@ -19,19 +30,93 @@ Base = declarative_base()
 # https://praciano.com.br/fastapi-and-async-sqlalchemy-20-with-pytest-done-right.html
 
 
+POOL_SIZING_ARGS = ("pool_size", "max_overflow", "pool_timeout", "pool_recycle")
+
+
+def get_engine_kwargs() -> dict[str, Any]:
+    """create_async_engine arguments from the DB_* settings"""
+    statement_cache_size = 0 if settings.DB_PGBOUNCER else settings.DB_STATEMENT_CACHE_SIZE
+    connect_args: dict[str, Any] = {
+        "statement_cache_size": statement_cache_size,
+        "prepared_statement_cache_size": statement_cache_size,
+    }
+    if settings.DB_PGBOUNCER:
+        # Statements are prepared on whichever server connection PgBouncer picks,
+        # unique names avoid "prepared statement already exists" errors
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+
 class DatabaseAsyncSessionManager:
-    def __init__(self, host: str, engine_kwargs: dict[str, Any] = {}):
-        poolclass = NullPool if settings.ENV == "test" else AsyncAdaptedQueuePool
+    def __init__(
+        self, host: str, engine_kwargs: dict[str, Any] = {}, replica_hosts: list[str] = []
+    ):
+        poolclass = NullPool if settings.ENV == "test" else InstrumentedAsyncAdaptedQueuePool
+        if poolclass is NullPool:
+            # A connection is opened per checkout, there is no pool to size
+            engine_kwargs = {
+                key: value for key, value in engine_kwargs.items() if key not in POOL_SIZING_ARGS
+            }
         self._engine = create_async_engine(host, poolclass=poolclass, **engine_kwargs)
-        self._sessionmaker = async_sessionmaker(autocommit=False, bind=self._engine)
+        # Objects stay loaded after commit, so returning them does not trigger lazy IO
+        self._sessionmaker = async_sessionmaker(
+            autocommit=False, expire_on_commit=False, bind=self._engine
+        )
+
+        self._replica_engines = [
+            create_async_engine(replica_host, poolclass=poolclass, **engine_kwargs)
+            for replica_host in replica_hosts
+        ]
+        self._replica_sessionmakers = [
+            async_sessionmaker(autocommit=False, expire_on_commit=False, bind=engine)
+            for engine in self._replica_engines
+        ]
+        self.pool_stats = [
+            PoolStats("primary", self._engine),
+            *(
+                PoolStats(f"replica-{index}", engine)
+                for index, engine in enumerate(self._replica_engines)
+            ),
+        ]
+        self.session_stats = SessionStats()
+        self._round_robin = itertools.count()
+        # Replica index -> time.monotonic() until which it is not used
+        self._ejected_until: dict[int, float] = {}
 
     async def close(self):
         if self._engine is None:
             raise Exception("DatabaseSessionManager is not initialized")
         await self._engine.dispose()
+        for engine in self._replica_engines:
+            await engine.dispose()
 
         self._engine = None
         self._sessionmaker = None
+        self._replica_engines = []
+        self._replica_sessionmakers = []
+
+    async def warm_up(self, connections: int) -> None:
+        """
+        Open `connections` connections on the primary and on every replica, all at once so
+        that they are distinct, then give them back to the pools which keep them open.
+        A failure is logged, so that the instance still starts while a database is down.
+        """
+        engines = [self._engine, *self._replica_engines]
+        try:
+            async with contextlib.AsyncExitStack() as stack:
+                for engine in engines:
+                    for _ in range(connections):
+                        connection = await stack.enter_async_context(engine.connect())
+                        await connection.execute(text("SELECT 1"))
+        except Exception as e:
+            log.exception(e)
 
     @contextlib.asynccontextmanager
     async def connect(self) -> AsyncIterator[AsyncConnection]:
@@ -50,19 +135,101 @@ class DatabaseAsyncSessionManager:
         if self._sessionmaker is None:
             raise Exception("DatabaseSessionManager is not initialized")
 
+        with self.session_stats.track():
+            session = self._sessionmaker()
+            try:
+                yield session
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                await session.close()
+
+    @contextlib.asynccontextmanager
+    async def read_session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Session in a READ ONLY transaction on a replica, picked round robin.
+        A replica failing to connect is ejected for REPLICA_EJECTION_SECONDS,
+        the primary is used when no replica is configured or available.
+        """
+        if self._sessionmaker is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+
+        with self.session_stats.track():
+            session = await self._connect_read_session()
+            try:
+                yield session
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                await session.close()
+
+    async def _connect_read_session(self) -> AsyncSession:
+        for index in self._available_replicas():
+            session = self._replica_sessionmakers[index]()
+            try:
+                await session.connection(execution_options={"postgresql_readonly": True})
+                return session
+            except (OSError, TimeoutError, DBAPIError) as e:
+                await session.close()
+                self._ejected_until[index] = time.monotonic() + settings.REPLICA_EJECTION_SECONDS
+                log.warning(
+                    f"Replica {index} ejected for {settings.REPLICA_EJECTION_SECONDS}s: {e}"
+                )
+
         session = self._sessionmaker()
         try:
-            yield session
+            await session.connection(execution_options={"postgresql_readonly": True})
         except Exception:
-            await session.rollback()
-            raise
-        finally:
             await session.close()
-
-
-session_manager = DatabaseAsyncSessionManager(settings.SQLALCHEMY_DATABASE_URI)
+            raise
+        return session
+
+    def _available_replicas(self) -> list[int]:
+        """Replicas not ejected, starting from the next one in round robin order"""
+        count = len(self._replica_sessionmakers)
+        if not count:
+            return []
+        start = next(self._round_robin)
+        now = time.monotonic()
+        indexes = ((start + offset) % count for offset in range(count))
+        return [index for index in indexes if self._ejected_until.get(index, 0) <= now]
+
+
+session_manager = DatabaseAsyncSessionManager(
+    settings.SQLALCHEMY_DATABASE_URI,
+    engine_kwargs=get_engine_kwargs(),
+    replica_hosts=settings.SQLALCHEMY_REPLICA_URIS,
+)
 
 
 async def get_db_session():
     async with session_manager.session() as session:
         yield session
+
+
+def get_db_session_factory():
+    """
+    For responses consuming the database after the endpoint returned (streaming),
+    which must own their session instead of using the request one.
+    """
+    return session_manager.session
+
+
+async def get_db_read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """
+    Read only session on a replica for safe methods. Write requests read on the primary,
+    so that they see the committed writes, only they open a primary session.
+    """
+    if request.method in ("GET", "HEAD", "OPTIONS"):
+        session_factory = session_manager.read_session
+    else:
+        session_factory = session_manager.session
+    async with session_factory() as session:
+        yield session
+
+
+def get_db_read_session_factory():
+    """Replica counterpart of get_db_session_factory"""
+    return session_manager.read_session
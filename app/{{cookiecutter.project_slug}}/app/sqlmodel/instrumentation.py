@@ -0,0 +1,173 @@
+import contextlib
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from sqlalchemy import AsyncAdaptedQueuePool, Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.cloud_logging import log, logger_struct
+from app.core.config import settings
+from app.core.request_context import current_query_stats, current_route
+
+
+def redact(parameters: Any) -> Any:
+    """Keep the shape and the types of statement parameters, never their values"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, list | tuple):
+        return [
+            redact(value) if isinstance(value, dict | list | tuple) else type(value).__name__
+            for value in parameters
+        ]
+    return type(parameters).__name__
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany) -> None:
+    # On the execution context, which a failing statement drops with its start time
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def record_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    start = getattr(context, "_query_start", None)
+    if start is None:
+        return
+    seconds = time.perf_counter() - start
+    if (stats := current_query_stats.get()) is not None:
+        stats.add(seconds, statement)
+    if seconds > settings.DB_SLOW_QUERY_SECONDS:
+        log.warning(
+            f"Slow query {seconds:.3f}s by {current_route.get() or 'no route'}: {statement}"
+        )
+        logger_struct.log_struct(
+            {
+                "event": "slow_query",
+                "seconds": seconds,
+                "route": current_route.get(),
+                "statement": statement,
+                "parameters": redact(parameters),
+            }
+        )
+
+
+@dataclass
+class Timing:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+def warn_long_hold(kind: str, seconds: float, route: str | None) -> None:
+    log.warning(f"{kind} held {seconds:.3f}s by {route or 'no route'}")
+    logger_struct.log_struct({"event": f"long_{kind}_hold", "seconds": seconds, "route": route})
+
+
+class InstrumentedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool recording how long checkouts wait for a connection"""
+
+    stats: "PoolStats | None" = None
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.stats is not None:
+                self.stats.wait.add(time.perf_counter() - start)
+
+    def recreate(self) -> "InstrumentedAsyncAdaptedQueuePool":
+        # dispose() replaces the pool, the new one keeps the stats
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class PoolStats:
+    def __init__(self, name: str, engine: AsyncEngine):
+        """
+        Checkout wait, connection hold time per route and pool gauges of an engine.
+        The wait is only measured with InstrumentedAsyncAdaptedQueuePool.
+        """
+        self.name = name
+        self.engine = engine
+        self.wait = Timing()
+        self.hold: dict[str, Timing] = defaultdict(Timing)
+        # Connections checked out: id of their pool record -> (checkout time, route)
+        self.held: dict[int, tuple[float, str | None]] = {}
+
+        pool = engine.sync_engine.pool
+        if isinstance(pool, InstrumentedAsyncAdaptedQueuePool):
+            pool.stats = self
+        event.listen(engine.sync_engine, "checkout", self.on_checkout)
+        event.listen(engine.sync_engine, "checkin", self.on_checkin)
+
+    def on_checkout(self, dbapi_connection: Any, connection_record: Any, proxy: Any) -> None:
+        self.held[id(connection_record)] = (time.perf_counter(), current_route.get())
+
+    def on_checkin(self, dbapi_connection: Any, connection_record: Any) -> None:
+        checkout = self.held.pop(id(connection_record), None)
+        if checkout is None:
+            return
+        start, route = checkout
+        seconds = time.perf_counter() - start
+        self.hold[route or "-"].add(seconds)
+        if seconds > settings.DB_HOLD_WARNING_SECONDS:
+            warn_long_hold("connection", seconds, route)
+
+    def snapshot(self) -> dict[str, Any]:
+        pool = self.engine.sync_engine.pool
+        now = time.perf_counter()
+        # NullPool has no size nor overflow
+        gauges = {
+            name: getattr(pool, name)() if hasattr(pool, name) else None
+            for name in ("size", "checkedin", "checkedout", "overflow")
+        }
+        return {
+            "name": self.name,
+            **gauges,
+            "checkout_wait": asdict(self.wait),
+            "hold": {route: asdict(timing) for route, timing in self.hold.items()},
+            # Connections still checked out past the threshold, leaked or slow
+            "long_held": [
+                {"route": route, "seconds": now - start}
+                for start, route in self.held.values()
+                if now - start > settings.DB_HOLD_WARNING_SECONDS
+            ],
+        }
+
+
+class SessionStats:
+    def __init__(self):
+        self.open = 0
+        self.lifetime: dict[str, Timing] = defaultdict(Timing)
+
+    @contextlib.contextmanager
+    def track(self) -> Iterator[None]:
+        """Count a session while it is open, warn when it stays open too long"""
+        route = current_route.get()
+        start = time.perf_counter()
+        self.open += 1
+        try:
+            yield
+        finally:
+            self.open -= 1
+            seconds = time.perf_counter() - start
+            self.lifetime[route or "-"].add(seconds)
+            if seconds > settings.DB_HOLD_WARNING_SECONDS:
+                warn_long_hold("session", seconds, route)
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "open": self.open,
+            "lifetime": {route: asdict(timing) for route, timing in self.lifetime.items()},
+        }
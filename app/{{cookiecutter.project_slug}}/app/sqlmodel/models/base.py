@@ -1,5 +1,6 @@
 import re
 from datetime import UTC, date, datetime
+from functools import lru_cache
 from typing import Literal, TypeVar
 
 from fastapi import HTTPException, status
@@ -12,7 +13,31 @@ from app.utils.date import formatAsDate
 
 T = TypeVar("T")
 
-
+# fmt:off
+# Aliases accepted by QueryFilter, mapped to the canonical operator used by the filter compiler
+OPERATOR_ALIASES: dict[str, str] = {
+    "=": "=", "eq": "=",
+    "!=": "!=", "ne": "!=", "neq": "!=",
+    ":": ":", "has": ":", "contains": ":", "includes": ":", "like": ":",
+    ">": ">", "gt": ">",
+    ">=": ">=", "ge": ">=",
+    "<": "<", "lt": "<",
+    "<=": "<=", "le": "<=",
+}
+COMPARISON_OPERATORS: frozenset[str] = frozenset({"<", "<=", ">=", ">"})
+RANGE_OPERATORS: frozenset[str] = frozenset({"in", "not_in"})
+TYPE_OPERATORS: frozenset[str] = frozenset({
+    "is_null",
+    "is_not_null",
+    "is_empty",
+    "is_not_empty",
+    "is_true",
+    "is_false",
+})
+# fmt:on
+
+
+@lru_cache(maxsize=1024)
 def to_snake(camel_str: str) -> str:
     return re.sub(r"(?<!^)(?=[A-Z])", "_", camel_str).lower()
 
@@ -34,15 +59,16 @@ class ReadBase(SQLModel):
     updated_at: datetime
 
 
-class TableBase(SQLModel):
-    id: int | None = Field(default=None, primary_key=True, nullable=False)
+class TimestampBase(SQLModel):
+    # Fetch server generated values with INSERT/UPDATE ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
 
     created_at: datetime | None = Field(
         sa_type=TIMESTAMP(timezone=True),
         sa_column_kwargs={
             "server_default": text("CURRENT_TIMESTAMP"),
         },
-        default=datetime.now(),
+        default=None,
         nullable=False,
     )
 
@@ -52,11 +78,15 @@ class TableBase(SQLModel):
             "server_default": text("CURRENT_TIMESTAMP"),
             "onupdate": text("CURRENT_TIMESTAMP"),
         },
-        default=datetime.now(),
+        default=None,
         nullable=False,
     )
 
 
+class TableBase(TimestampBase):
+    id: int | None = Field(default=None, primary_key=True, nullable=False)
+
+
 class QueryFilter(SQLModel):
     # fmt:off
     field: str
@@ -85,84 +115,45 @@ class QueryFilter(SQLModel):
 
     @model_validator(mode="before")
     def validate_value(cls, values: dict[str, str]) -> dict:
-        # fmt:off
-        comparison_operators: set[str] = {
-            "<", "lt",
-            "<=", "le",
-            ">=", "ge",
-            ">", "gt",
-        }
-        range_operators: set[str] = {
-            "in",
-            "not_in",
-        }
-        type_operators: set[str] = {
-            "is_null",
-            "is_not_null",
-            "is_empty",
-            "is_not_empty",
-            "is_true",
-            "is_false"
-        }
-        # fmt:on
-        special_operators: set[str] = {*range_operators, *type_operators}
-
         field, operator, value = values["field"], values.get("operator"), values.get("value")
         values["field"] = to_snake(field)
 
-        try:
-            if isinstance(value, str):
-                values["value"] = formatAsDate(value)
-        except ValueError:
-            pass
+        if isinstance(value, str):
+            values["value"] = formatAsDate(value)
 
-        if operator not in special_operators:
+        if operator in RANGE_OPERATORS:
+            if not isinstance(value, list):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Value must be a list",
+                )
+            if not value:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Value cannot be empty",
+                )
+        elif operator in TYPE_OPERATORS:
+            if value:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Value must be empty",
+                )
+        else:
             if value is None:
                 raise HTTPException(status_code=400, detail="Value is required for this operator.")
 
-            if not isinstance(values["value"], int | float | date | datetime):
-                if operator in comparison_operators:
-                    raise ValueError(
-                        f"Comparison operator requires type int, float, date or datetime: got {type(values['value'])}"
-                    )
-
-            if operator in ["eq", "="]:
-                values["operator"] = "="
-            elif operator in ["ne", "neq", "!="]:
-                values["operator"] = "!="
-            elif operator in ["has", "contains", "includes", "like", ":"]:
-                values["operator"] = ":"
-            elif operator in ["gt", ">"]:
-                values["operator"] = ">"
-            elif operator in ["ge", ">="]:
-                values["operator"] = ">="
-            elif operator in ["lt", "<"]:
-                values["operator"] = "<"
-            elif operator in ["le", "<="]:
-                values["operator"] = "<="
-            else:
+            canonical = OPERATOR_ALIASES.get(operator)
+            if canonical in COMPARISON_OPERATORS and not isinstance(
+                values["value"], int | float | date | datetime
+            ):
+                raise ValueError(
+                    f"Comparison operator requires type int, float, date or datetime: got {type(values['value'])}"
+                )
+            if canonical is None:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Invalid operator",
                 )
-
-        else:
-            if operator in range_operators:
-                if not isinstance(value, list):
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Value must be a list",
-                    )
-                if not value:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Value cannot be empty",
-                    )
-            elif operator in type_operators:
-                if value:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Value must be empty",
-                    )
+            values["operator"] = canonical
 
         return values
@@ -20,9 +20,8 @@ class TodoBase(AppBase):
 
 
 class Todo(TodoBase, TableBase, table=True):
-    users: list["User"] = Relationship(
-        back_populates="todos", link_model=UserTodo, sa_relationship_kwargs={"lazy": "selectin"}
-    )
+    # Not loaded by default, endpoints returning users opt in with selectinload
+    users: list["User"] = Relationship(back_populates="todos", link_model=UserTodo)
 
 
 class TodoRead(ReadBase, TodoBase):
@@ -40,3 +39,18 @@ class TodoCreate(TodoBase):
 
 class TodoUpdate(TodoBase):
     users_id: list[int] | None
+
+
+class TodoPatch(AppBase):
+    # Omitted fields are left unchanged, an explicit null is only accepted where the column allows it
+    title: str = None
+    description: str | None = None
+    priority: TodoPriority = None
+    users_id: list[int] | None = None
+
+
+class TodoUpdateMany(AppBase):
+    id: int
+    title: str | None = None
+    description: str | None = None
+    priority: TodoPriority | None = None
@@ -40,3 +40,12 @@ class UserCreate(UserBase):
 
 class UserUpdate(UserBase):
     pass
+
+
+class UserUpdateMany(AppBase):
+    id: int
+    first_name: str | None = None
+    last_name: str | None = None
+    email: str | None = None
+    is_admin: bool | None = None
+    login_times: int | None = None
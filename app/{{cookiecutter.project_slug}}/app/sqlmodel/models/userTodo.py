@@ -1,9 +1,9 @@
 from sqlmodel import Field
 
-from app.sqlmodel.models.base import AppBase, TableBase
+from app.sqlmodel.models.base import AppBase, TimestampBase
 
 
-class UserTodo(AppBase, TableBase, table=True):
+class UserTodo(AppBase, TimestampBase, table=True):
     """Linking table between User and Todo"""
 
     todo_id: int | None = Field(
@@ -1,13 +1,15 @@
+import re
 from datetime import datetime
 
+DATE_PATTERN = re.compile(r"\d{4}-\d{1,2}-\d{1,2}( \d{1,2}:\d{1,2}:\d{1,2})?")
+
 
 def formatAsDate(value):
+    # Only strings shaped like a date are parsed, others are returned without raising
+    match = DATE_PATTERN.fullmatch(value)
+    if not match:
+        return value
     try:
-        return datetime.strptime(value, "%Y-%m-%d")
-    except ValueError:
-        pass
-    try:
-        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S" if match.group(1) else "%Y-%m-%d")
     except ValueError:
-        pass
-    return value
+        return value
@@ -0,0 +1,52 @@
+import csv
+import io
+from collections.abc import AsyncIterator, Sequence
+from typing import Any, Literal
+
+from pydantic import BaseModel
+from starlette.responses import StreamingResponse
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES: dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+async def iter_ndjson(
+    chunks: AsyncIterator[Sequence[Any]], schema: type[BaseModel]
+) -> AsyncIterator[str]:
+    async for chunk in chunks:
+        yield "".join(f"{schema.model_validate(row).model_dump_json()}\n" for row in chunk)
+
+
+async def iter_csv(
+    chunks: AsyncIterator[Sequence[Any]], schema: type[BaseModel]
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(schema.model_fields))
+    writer.writeheader()
+    async for chunk in chunks:
+        writer.writerows(schema.model_validate(row).model_dump(mode="json") for row in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header of an empty export
+        yield buffer.getvalue()
+
+
+def export_response(
+    chunks: AsyncIterator[Sequence[Any]],
+    schema: type[BaseModel],
+    format: ExportFormat,
+    filename: str,
+) -> StreamingResponse:
+    """Stream the rows serialized with `schema`, one chunk at a time"""
+    content = iter_csv(chunks, schema) if format == "csv" else iter_ndjson(chunks, schema)
+    return StreamingResponse(
+        content,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
@@ -0,0 +1,37 @@
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.orm import configure_mappers
+
+from app.core.cloud_logging import log
+from app.core.config import settings
+from app.sqlmodel.db import session_manager
+
+
+async def warm_up(app: FastAPI) -> None:
+    """
+    Pay at startup what the first requests of an instance would pay otherwise:
+    mapper configuration, the OpenAPI schema, pool connections, and with WARMUP_PATHS the
+    compilation of their statements and the first run of their validators and serializers.
+    Failures are logged, the instance still starts.
+    """
+    start = time.perf_counter()
+    configure_mappers()
+    app.openapi()
+
+    # Fill the pools, session_manager logs a failure and the instance still starts
+    await session_manager.warm_up(settings.WARMUP_CONNECTIONS)
+
+    if settings.WARMUP_PATHS:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://warmup") as client:
+            for path in settings.WARMUP_PATHS:
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 400:
+                        log.warning(f"Warm-up of {path} returned {response.status_code}")
+                except Exception as e:
+                    log.exception(e)
+
+    log.info(f"Warm-up done in {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,35 @@
+"""timestamp_server_defaults
+
+Revision ID: 7c2d1f0a9b3e
+Revises: 1eb8ef4fc04e
+Create Date: 2026-10-18 10:12:41.208311
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7c2d1f0a9b3e"
+down_revision: Union[str, None] = "1eb8ef4fc04e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("todo", "user", "usertodo")
+COLUMNS = ("created_at", "updated_at")
+
+
+def upgrade():
+    # Timestamps are generated by the database and fetched with RETURNING, see TimestampBase
+    for table in TABLES:
+        for column in COLUMNS:
+            op.alter_column(table, column, server_default=sa.text("CURRENT_TIMESTAMP"))
+
+
+def downgrade():
+    for table in TABLES:
+        for column in COLUMNS:
+            op.alter_column(table, column, server_default=None)
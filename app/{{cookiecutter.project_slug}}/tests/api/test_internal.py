@@ -0,0 +1,36 @@
+import pytest
+from httpx import AsyncClient
+
+from app.core.config import settings
+from tests.utils.query_budget import query_budget
+
+DATASOURCES_URL = f"{settings.API_PREFIX}/internal"
+
+
+@pytest.fixture
+def expose_internal(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "EXPOSE_INTERNAL", True)
+
+
+@query_budget(0)
+async def test_internal_not_exposed(client: AsyncClient) -> None:
+    for path in ["pool", "logs"]:
+        response = await client.get(f"{DATASOURCES_URL}/{path}")
+        assert response.status_code == 404
+
+
+@query_budget(0)
+async def test_get_pool_stats(client: AsyncClient, expose_internal: None) -> None:
+    response = await client.get(f"{DATASOURCES_URL}/pool")
+    assert response.status_code == 200
+    content = response.json()
+    assert [pool["name"] for pool in content["pools"]] == ["primary"]
+    assert {"checkout_wait", "hold", "long_held"} <= content["pools"][0].keys()
+    assert content["sessions"]["open"] >= 0
+
+
+@query_budget(0)
+async def test_get_log_queue_stats(client: AsyncClient, expose_internal: None) -> None:
+    response = await client.get(f"{DATASOURCES_URL}/logs")
+    assert response.status_code == 200
+    assert response.json().keys() == {"queued", "shipped", "dropped", "failed"}
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app import main
+from app.core.config import settings
+from app.warmup import warm_up
+
+HEALTH_URL = f"{settings.API_PREFIX}/health"
+
+
+async def test_not_ready_until_warmed_up(monkeypatch: pytest.MonkeyPatch) -> None:
+    warming_up, warmed_up = asyncio.Event(), asyncio.Event()
+    started, stopping = asyncio.Event(), asyncio.Event()
+
+    async def slow_warm_up(app: FastAPI) -> None:
+        warming_up.set()
+        await warmed_up.wait()
+
+    async def close() -> None:
+        # The tests keep using the engine
+        pass
+
+    monkeypatch.setattr(settings, "WARMUP_ENABLED", True)
+    monkeypatch.setattr(main, "warm_up", slow_warm_up)
+    monkeypatch.setattr(main.session_manager, "close", close)
+    # Removed once the test is done, the app is ready when its lifespan does not run
+    monkeypatch.setattr(main.app.state, "ready", True, raising=False)
+
+    async def serve() -> None:
+        async with main.lifespan(main.app):
+            started.set()
+            await stopping.wait()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        server = asyncio.create_task(serve())
+        await warming_up.wait()
+        response = await client.get(HEALTH_URL)
+        assert response.status_code == 503
+        assert response.json() == {"status": "NOT_READY"}
+
+        warmed_up.set()
+        await started.wait()
+        response = await client.get(HEALTH_URL)
+        assert response.status_code == 200
+
+        stopping.set()
+        await server
+        assert (await client.get(HEALTH_URL)).status_code == 503
+
+
+async def test_warm_up_failing_path(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    caplog.set_level(logging.INFO)
+    unknown_url = f"{settings.API_PREFIX}/unknown"
+    monkeypatch.setattr(settings, "WARMUP_CONNECTIONS", 1)
+    monkeypatch.setattr(settings, "WARMUP_PATHS", [unknown_url, HEALTH_URL])
+
+    await warm_up(main.app)
+
+    assert f"Warm-up of {unknown_url} returned 404" in caplog.text
+    assert f"Warm-up of {HEALTH_URL}" not in caplog.text
+    assert "Warm-up done" in caplog.text
@@ -0,0 +1,21 @@
+from httpx import AsyncClient
+
+from app.core.config import settings
+from tests.utils.query_budget import query_budget
+
+
+@query_budget(1)
+async def test_get_metrics(client: AsyncClient) -> None:
+    await client.get(f"{settings.API_PREFIX}/todo/999999")
+    await client.get(f"{settings.API_PREFIX}/unknown/999999")
+
+    response = await client.get(f"{settings.API_PREFIX}/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    content = response.text
+    # Labelled by route template and status class, never by raw path
+    assert 'method="GET",route="/api/todo/{_id}",status="4xx"' in content
+    assert 'method="GET",route="unmatched",status="4xx"' in content
+    assert "/999999" not in content
+    assert "http_requests_in_flight" in content
+    assert "http_response_size_bytes_count" in content
@@ -0,0 +1,68 @@
+from typing import Any
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.cloud_logging import logger_struct
+from app.core.config import settings
+from tests.utils.query_budget import query_budget
+
+
+@pytest.fixture
+def log_entries(monkeypatch: pytest.MonkeyPatch) -> list[dict[str, Any]]:
+    entries: list[dict[str, Any]] = []
+    monkeypatch.setattr(logger_struct, "log_struct", entries.append)
+    return entries
+
+
+@query_budget(2)
+async def test_log_truncated_bodies(
+    client: AsyncClient, log_entries: list[dict[str, Any]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "LOG_BODY_MAX_BYTES", 10)
+
+    response = await client.patch(f"{settings.API_PREFIX}/todo/999999", json={"title": "a" * 100})
+    assert response.status_code == 404
+
+    (entry,) = log_entries
+    assert entry["body"] == '{"title": '
+    assert entry["body_bytes"] == int(response.request.headers["content-length"])
+    assert entry["body_truncated"]
+    assert entry["content"] == response.content[:10].decode()
+    assert entry["content_bytes"] == len(response.content)
+    assert entry["content_truncated"]
+
+
+@query_budget(0)
+async def test_log_no_capture_route(
+    client: AsyncClient, log_entries: list[dict[str, Any]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "LOG_NO_CAPTURE_ROUTES", [f"{settings.API_PREFIX}/health"])
+
+    response = await client.get(f"{settings.API_PREFIX}/health")
+    assert response.json() == {"status": "OK"}
+
+    (entry,) = log_entries
+    assert entry["content"] is None
+    assert entry["content_bytes"] is None
+    assert not entry["content_truncated"]
+
+
+@query_budget(1)
+async def test_log_sampling(
+    client: AsyncClient, log_entries: list[dict[str, Any]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "LOG_SAMPLE_RATE", 0)
+    monkeypatch.setattr(settings, "LOG_ALWAYS_STATUS", 400)
+
+    response = await client.get(f"{settings.API_PREFIX}/health")
+    assert response.status_code == 200
+    assert log_entries == []
+
+    # Errors are logged whatever the rate, without their bodies
+    response = await client.get(f"{settings.API_PREFIX}/todo/999999")
+    assert response.status_code == 404
+    (entry,) = log_entries
+    assert entry["sampled_by"] == "status"
+    assert entry["sample_rate"] == 0
+    assert entry["content"] is None
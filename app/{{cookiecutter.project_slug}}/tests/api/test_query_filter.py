@@ -1,13 +1,18 @@
+import json
+
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.sqlmodel.api.deps import parse_query_filter_params, parse_raw_query_filters
+from tests.utils.query_budget import query_budget
 from tests.utils.query_filter import call_from_operator
 from tests.utils.user import create_user
 
 DATASOURCES_URL = f"{settings.API_PREFIX}/user"
 
 
+@query_budget(2)
 async def test_query_filter_users(client: AsyncClient, db: AsyncSession) -> None:
     user0 = await create_user(
         db, "Jean", "jean.dupont@gmail.com", "jean.dupont@gmail.com", True, 135
@@ -99,3 +104,21 @@ async def test_query_filter_users(client: AsyncClient, db: AsyncSession) -> None
     assert items[0].get("first_name") == "Louis"
     assert items[1].get("first_name") == "Jean"
     assert items[2].get("first_name") == "Anna"
+
+
+@query_budget(0)
+async def test_query_filter_unknown_field(client: AsyncClient, db: AsyncSession) -> None:
+    filters = json.dumps([{"field": "password", "operator": "eq", "value": "secret"}])
+    response = await client.get(DATASOURCES_URL, params={"filters": filters})
+    assert response.status_code == 400
+
+
+async def test_query_filter_parsing_cache() -> None:
+    filters = json.dumps([{"field": "firstName", "operator": "has", "value": "%an%"}])
+    hits = parse_raw_query_filters.cache_info().hits
+    first = parse_query_filter_params(filters)
+    second = parse_query_filter_params(filters)
+    assert parse_raw_query_filters.cache_info().hits == hits + 1
+    assert first == second
+    assert first[0].field == "first_name"
+    assert first[0].operator == ":"
@@ -1,13 +1,22 @@
+import json
+
+import pytest
 from fastapi.encoders import jsonable_encoder
 from httpx import AsyncClient
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.sqlmodel.crud.todo import CrudTodo, todos
+from app.sqlmodel.models.todo import Todo
+from tests.utils.query_budget import query_budget
 from tests.utils.todo import build_todo_in, create_random_todo
+from tests.utils.user import create_random_user
 
 DATASOURCES_URL = f"{settings.API_PREFIX}/todo"
 
 
+@query_budget(1)
 async def test_get_todo(client: AsyncClient, db: AsyncSession) -> None:
     await create_random_todo(db)
     response = await client.get(
@@ -18,6 +27,7 @@ async def test_get_todo(client: AsyncClient, db: AsyncSession) -> None:
     assert content.get("id") is not None
 
 
+@query_budget(1)
 async def test_get_todos(client: AsyncClient, db: AsyncSession) -> None:
     await create_random_todo(db)
     await create_random_todo(db)
@@ -32,8 +42,12 @@ async def test_get_todos(client: AsyncClient, db: AsyncSession) -> None:
     items = content.get("items")
     assert len(items) == 3
     assert items[0].get("id") is not None
+    # The version of the list comes with the page and its total
+    assert 'desc="1 queries"' in response.headers["server-timing"]
+    assert "etag" in response.headers
 
 
+@query_budget(2)
 async def test_create_todo(client: AsyncClient, db: AsyncSession) -> None:
     todo = build_todo_in()
     response = await client.post(
@@ -45,6 +59,7 @@ async def test_create_todo(client: AsyncClient, db: AsyncSession) -> None:
     assert content.get("id") is not None
 
 
+@query_budget(2)
 async def test_update_todo(client: AsyncClient, db: AsyncSession) -> None:
     todo = await create_random_todo(db)
     todo.title = "updated"
@@ -62,6 +77,7 @@ async def test_update_todo(client: AsyncClient, db: AsyncSession) -> None:
     assert content.get("title") == todo.title
 
 
+@query_budget(2)
 async def test_delete_todo(client: AsyncClient, db: AsyncSession) -> None:
     todo = await create_random_todo(db)
     response = await client.delete(
@@ -73,3 +89,280 @@ async def test_delete_todo(client: AsyncClient, db: AsyncSession) -> None:
         f"{DATASOURCES_URL}/{todo.id}",
     )
     assert response.status_code == 404
+
+
+@query_budget(4)
+async def test_get_todos_count_modes(client: AsyncClient, db: AsyncSession) -> None:
+    for _ in range(3):
+        await create_random_todo(db)
+
+    response = await client.get(f"{DATASOURCES_URL}", params={"per_page": 2, "count": "none"})
+    assert response.status_code == 200
+    content = response.json()
+    assert content.get("total") is None
+    assert content.get("has_next") is True
+    assert len(content.get("items")) == 2
+
+    response = await client.get(f"{DATASOURCES_URL}", params={"per_page": 2, "count": "estimated"})
+    assert response.status_code == 200
+    assert isinstance(response.json().get("total"), int)
+
+    filters = json.dumps([{"field": "title", "operator": "is_not_empty", "value": None}])
+    response = await client.get(
+        f"{DATASOURCES_URL}", params={"count": "estimated", "filters": filters}
+    )
+    assert response.status_code == 200
+    assert isinstance(response.json().get("total"), int)
+
+
+@query_budget(5)
+async def test_bulk_todos(client: AsyncClient, db: AsyncSession) -> None:
+    todos = [jsonable_encoder(build_todo_in()) for _ in range(3)]
+    response = await client.post(f"{DATASOURCES_URL}/bulk", json=todos)
+    assert response.status_code == 200
+    content = response.json()
+    assert content.get("errors") == []
+    ids = [item.get("id") for item in content.get("items")]
+    assert [item.get("title") for item in content.get("items")] == [t["title"] for t in todos]
+
+    response = await client.patch(
+        f"{DATASOURCES_URL}/bulk",
+        json=[{"id": ids[0], "title": "updated"}, {"id": -1, "title": "missing"}],
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert [item.get("title") for item in content.get("items")] == ["updated"]
+    assert content.get("errors")[0].get("index") == 1
+
+    response = await client.request("DELETE", f"{DATASOURCES_URL}/bulk", json=[*ids, -1])
+    assert response.status_code == 200
+    content = response.json()
+    assert content.get("items") == ids
+    assert content.get("errors")[0].get("id") == -1
+
+
+@query_budget(5)
+async def test_bulk_delete_linked_todos(client: AsyncClient, db: AsyncSession) -> None:
+    users = [await create_random_user(db) for _ in range(2)]
+    user_ids = [user.id for user in users]
+    todos = [await create_random_todo(db) for _ in range(2)]
+    for todo in todos:
+        todo_in = jsonable_encoder(build_todo_in())
+        todo_in["users_id"] = user_ids
+        response = await client.put(f"{DATASOURCES_URL}/{todo.id}", json=todo_in)
+        assert response.status_code == 200
+
+    # usertodo has no ON DELETE CASCADE, the links are deleted with the todos
+    response = await client.request("DELETE", f"{DATASOURCES_URL}/bulk", json=[todos[0].id])
+    assert response.status_code == 200
+    content = response.json()
+    assert content.get("items") == [todos[0].id]
+    assert content.get("errors") == []
+
+    # And with the users, which also drops the users other tests would count
+    response = await client.request("DELETE", f"{settings.API_PREFIX}/user/bulk", json=user_ids)
+    assert response.status_code == 200
+    content = response.json()
+    assert content.get("items") == user_ids
+    assert content.get("errors") == []
+
+    response = await client.get(f"{DATASOURCES_URL}/{todos[1].id}/users/")
+    assert response.json().get("users") == []
+
+
+@query_budget(2)
+async def test_export_todos(client: AsyncClient, db: AsyncSession) -> None:
+    for _ in range(3):
+        await create_random_todo(db)
+    response = await client.get(f"{DATASOURCES_URL}", params={"count": "exact"})
+    total = response.json().get("total")
+
+    response = await client.get(f"{DATASOURCES_URL}/export", params={"format": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == total
+    assert rows[0].get("id") is not None
+
+    response = await client.get(f"{DATASOURCES_URL}/export", params={"format": "csv"})
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert "id" in lines[0].split(",")
+    assert len(lines) == total + 1
+
+
+@query_budget(2)
+async def test_get_todos_sparse_fields(client: AsyncClient, db: AsyncSession) -> None:
+    todo = await create_random_todo(db)
+    response = await client.get(f"{DATASOURCES_URL}", params={"fields": "id,title,priority"})
+    assert response.status_code == 200
+    items = response.json().get("items")
+    assert set(items[0]) == {"id", "title", "priority"}
+
+    response = await client.get(f"{DATASOURCES_URL}/{todo.id}", params={"fields": "title"})
+    assert response.status_code == 200
+    assert response.json() == {"title": todo.title}
+
+    response = await client.get(f"{DATASOURCES_URL}/{todo.id}", params={"fields": "unknown"})
+    assert response.status_code == 400
+
+
+@query_budget(2)
+async def test_get_todo_users(client: AsyncClient, db: AsyncSession) -> None:
+    todo = await create_random_todo(db)
+    response = await client.get(f"{DATASOURCES_URL}/{todo.id}/users/")
+    assert response.status_code == 200
+    assert response.json().get("users") == []
+
+    response = await client.get(f"{DATASOURCES_URL}/withusers")
+    assert response.status_code == 200
+    assert all("users" in item for item in response.json())
+
+
+@query_budget(4)
+async def test_update_todo_users(client: AsyncClient, db: AsyncSession) -> None:
+    users = [await create_random_user(db) for _ in range(3)]
+    todo = await create_random_todo(db)
+    todo_in = jsonable_encoder(build_todo_in())
+
+    async def linked_users() -> set[int]:
+        response = await client.get(f"{DATASOURCES_URL}/{todo.id}/users/")
+        assert response.status_code == 200
+        return {user["id"] for user in response.json()["users"]}
+
+    todo_in["users_id"] = [users[0].id, users[1].id, 999999]
+    response = await client.put(f"{DATASOURCES_URL}/{todo.id}", json=todo_in)
+    assert response.status_code == 200
+    assert await linked_users() == {users[0].id, users[1].id}
+
+    todo_in["users_id"] = [users[1].id, users[2].id]
+    response = await client.put(f"{DATASOURCES_URL}/{todo.id}", json=todo_in)
+    assert response.status_code == 200
+    assert await linked_users() == {users[1].id, users[2].id}
+
+    # Neither a missing nor an empty list removes the links
+    for users_id in [None, []]:
+        todo_in["users_id"] = users_id
+        response = await client.put(f"{DATASOURCES_URL}/{todo.id}", json=todo_in)
+        assert response.status_code == 200
+        assert await linked_users() == {users[1].id, users[2].id}
+
+    # The endpoint commits, so drop the users other tests would count
+    response = await client.request(
+        "DELETE", f"{settings.API_PREFIX}/user/bulk", json=[user.id for user in users]
+    )
+    assert response.status_code == 200
+
+
+@query_budget(2)
+async def test_patch_todo(client: AsyncClient, db: AsyncSession) -> None:
+    todo = await create_random_todo(db)
+    response = await client.patch(f"{DATASOURCES_URL}/{todo.id}", json={"title": "patched"})
+    assert response.status_code == 200
+    content = response.json()
+    assert content["title"] == "patched"
+    assert content["description"] == todo.description
+    assert content["priority"] == todo.priority
+
+    response = await client.patch(f"{DATASOURCES_URL}/{todo.id}", json={"title": None})
+    assert response.status_code == 422
+
+    response = await client.patch(f"{DATASOURCES_URL}/999999", json={"title": "patched"})
+    assert response.status_code == 404
+
+    response = await client.delete(f"{DATASOURCES_URL}/999999")
+    assert response.status_code == 404
+
+
+async def test_todo_query_cache(db: AsyncSession) -> None:
+    crud = CrudTodo(Todo, cache_size=8)
+    todo = await create_random_todo(db)
+
+    first = await crud.get(db, todo.id)
+    second = await crud.get(db, todo.id)
+    assert second.title == first.title == todo.title
+    assert crud.cache.stats() == {"size": 1, "hits": 1, "misses": 1}
+
+    page = await crud.get_multi(db, per_page=5)
+    assert (await crud.get_multi(db, per_page=5)).total == page.total
+    assert crud.cache.stats()["hits"] == 2
+
+    patched = await crud.patch_by_id(db, id=todo.id, obj_in={"title": "cached"}, commit=False)
+    assert patched.title == "cached"
+    assert crud.cache.stats()["size"] == 0
+    assert (await crud.get(db, todo.id)).title == "cached"
+
+    await crud.delete_by_id(db, id=todo.id, commit=False)
+    assert await crud.get(db, todo.id) is None
+
+
+@pytest.mark.parametrize("execution", ["sequential", "concurrent", "window"])
+async def test_todos_pagination_execution(db: AsyncSession, execution: str) -> None:
+    ids = [(await create_random_todo(db)).id for _ in range(3)]
+    # The concurrent count runs on a second connection, which only sees committed rows
+    await db.commit()
+    try:
+        total = await db.scalar(select(func.count()).select_from(Todo))
+        page = await todos.get_multi(db, per_page=2, execution=execution)
+        assert page.total == total
+        assert len(page.items) == 2
+        assert page.has_next is True
+    finally:
+        await todos.delete_many(db, ids=ids)
+
+
+@query_budget(2)
+async def test_todo_conditional_get(client: AsyncClient, db: AsyncSession) -> None:
+    todo = await create_random_todo(db)
+    url = f"{DATASOURCES_URL}/{todo.id}"
+    response = await client.get(url)
+    assert response.status_code == 200
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    response = await client.get(url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    response = await client.get(url, params={"fields": "title"})
+    assert response.headers["etag"] != etag
+
+
+@query_budget(2)
+async def test_todos_conditional_get(client: AsyncClient, db: AsyncSession) -> None:
+    todos = [await create_random_todo(db) for _ in range(2)]
+    url = f"{DATASOURCES_URL}?per_page=5"
+    response = await client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    # max(updated_at) is unchanged by a DELETE, a list has no Last-Modified
+    assert "last-modified" not in response.headers
+
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    response = await client.get(
+        url, headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+    )
+    assert response.status_code == 200
+
+    response = await client.get(url + "&fields=title")
+    assert response.headers["etag"] != etag
+
+    # Without the window count, the version of the list is only queried for If-None-Match
+    response = await client.get(url + "&count=none")
+    assert "etag" not in response.headers
+    response = await client.get(url + "&cursor=")
+    assert "etag" not in response.headers
+
+    # updated_at is the transaction time, constant within a test, so change the count
+    await create_random_todo(db)
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = await client.delete(f"{DATASOURCES_URL}/{todos[0].id}")
+    assert response.status_code == 200
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
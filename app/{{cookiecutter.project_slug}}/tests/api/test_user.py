@@ -3,11 +3,14 @@ from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from tests.utils.user import build_random_user_in, create_random_user
+from app.sqlmodel.crud.base import encode_cursor
+from tests.utils.query_budget import query_budget
+from tests.utils.user import build_random_user_in, create_random_user, create_user
 
 DATASOURCES_URL = f"{settings.API_PREFIX}/user"
 
 
+@query_budget(1)
 async def test_get_user(client: AsyncClient, db: AsyncSession) -> None:
     user = await create_random_user(db)
     response = await client.get(
@@ -18,6 +21,7 @@ async def test_get_user(client: AsyncClient, db: AsyncSession) -> None:
     assert content.get("id") is not None
 
 
+@query_budget(2)
 async def test_get_users(client: AsyncClient, db: AsyncSession) -> None:
     await create_random_user(db)
     await create_random_user(db)
@@ -33,6 +37,7 @@ async def test_get_users(client: AsyncClient, db: AsyncSession) -> None:
     assert len(items) == 3
 
 
+@query_budget(1)
 async def test_create_user(client: AsyncClient, db: AsyncSession) -> None:
     user = build_random_user_in()
     response = await client.post(
@@ -42,3 +47,51 @@ async def test_create_user(client: AsyncClient, db: AsyncSession) -> None:
     assert response.status_code == 200
     content = response.json()
     assert content.get("email") == user.email
+
+
+@query_budget(3)
+async def test_get_users_with_cursor(client: AsyncClient, db: AsyncSession) -> None:
+    # Ties and NULLs on login_times span the pages
+    for login_times in [None, 5, None, 5, 10]:
+        user_in = build_random_user_in()
+        await create_user(db, **{**user_in.model_dump(), "login_times": login_times})
+
+    # Ascending and descending, on a text column and on the nullable login_times
+    for sort, is_desc in [
+        ("first_name", False),
+        ("first_name", True),
+        ("login_times", False),
+        ("login_times", True),
+    ]:
+        response = await client.get(
+            f"{DATASOURCES_URL}",
+            params={"sort": sort, "is_desc": is_desc, "per_page": settings.MAX_PAGE_SIZE},
+        )
+        content = response.json()
+        assert content.get("total") <= settings.MAX_PAGE_SIZE
+        expected = [item.get("id") for item in content.get("items")]
+
+        ids, cursor = [], ""
+        while cursor is not None:
+            response = await client.get(
+                f"{DATASOURCES_URL}",
+                params={"sort": sort, "is_desc": is_desc, "per_page": 2, "cursor": cursor},
+            )
+            assert response.status_code == 200
+            content = response.json()
+            ids.extend(item.get("id") for item in content.get("items"))
+            cursor = content.get("next_cursor")
+
+        assert ids == expected
+
+
+@query_budget(0)
+async def test_get_users_with_malformed_cursor(client: AsyncClient) -> None:
+    response = await client.get(f"{DATASOURCES_URL}", params={"cursor": "invalid"})
+    assert response.status_code == 400
+
+    # Well encoded, but with values which are not the sort key values of a row
+    for values in [1, {"id": 1}, [{"id": 1}]]:
+        cursor = encode_cursor("id", False, values)
+        response = await client.get(f"{DATASOURCES_URL}", params={"cursor": cursor})
+        assert response.status_code == 400
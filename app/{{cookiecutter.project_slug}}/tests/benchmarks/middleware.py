@@ -0,0 +1,47 @@
+"""
+Per-request overhead of the middleware stack of `app.main`.
+The same requests are sent in-process to the application and to a copy of it without
+middleware, the difference is the cost of the stack. Run it with
+`ENV=test python -m tests.benchmarks.middleware [requests]`.
+"""
+
+import asyncio
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.router import api_router
+from app.core.config import settings
+from app.main import app
+
+PATH = f"{settings.API_PREFIX}/health"
+
+
+async def measure(application: FastAPI, requests: int) -> float:
+    """Mean time of a request in microseconds"""
+    transport = httpx.ASGITransport(app=application)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for _ in range(requests // 10):
+            await client.get(PATH)
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get(PATH)
+            response.raise_for_status()
+        return (time.perf_counter() - start) / requests * 1_000_000
+
+
+async def main(requests: int) -> None:
+    bare = FastAPI()
+    bare.include_router(api_router, prefix=settings.API_PREFIX)
+    without = await measure(bare, requests)
+    with_stack = await measure(app, requests)
+    print(f"{requests} requests to {PATH}")
+    print(f"without middleware: {without:8.1f} us/request")
+    print(f"with middleware:    {with_stack:8.1f} us/request")
+    print(f"overhead:           {with_stack - without:8.1f} us/request")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -1,11 +1,19 @@
-from contextlib import ExitStack
+from contextlib import ExitStack, asynccontextmanager
 
 import httpx
 import pytest
+from sqlalchemy import Engine, event
 
 from app.main import app as actual_app
 from app.sqlmodel import SQLModel
-from app.sqlmodel.db import DatabaseAsyncSessionManager, get_db_session
+from app.sqlmodel.db import (
+    DatabaseAsyncSessionManager,
+    get_db_read_session,
+    get_db_read_session_factory,
+    get_db_session,
+    get_db_session_factory,
+)
+from tests.utils.query_budget import QueryCounter
 
 
 @pytest.fixture(autouse=True)
@@ -38,8 +46,21 @@ async def setup_database(session_manager: DatabaseAsyncSessionManager):
 
 
 @pytest.fixture(scope="function")
-async def client():
-    async with httpx.AsyncClient(app=actual_app, base_url="http://localhost:8000") as c:
+def query_counter(request):
+    """Statements per request of `client`, checked against the `query_budget` marker"""
+    marker = request.node.get_closest_marker("query_budget")
+    counter = QueryCounter(*marker.args, **marker.kwargs) if marker else QueryCounter()
+    event.listen(Engine, "before_cursor_execute", counter.on_execute)
+    yield counter
+    event.remove(Engine, "before_cursor_execute", counter.on_execute)
+
+
+@pytest.fixture(scope="function")
+async def client(query_counter: QueryCounter):
+    event_hooks = {"request": [query_counter.on_request], "response": [query_counter.on_response]}
+    async with httpx.AsyncClient(
+        app=actual_app, base_url="http://localhost:8000", event_hooks=event_hooks
+    ) as c:
         yield c
 
 
@@ -63,4 +84,12 @@ async def session_override(app, db):
     async def get_db_session_override():
         yield db
 
+    @asynccontextmanager
+    async def session_factory_override():
+        yield db
+
     app.dependency_overrides[get_db_session] = get_db_session_override
+    app.dependency_overrides[get_db_session_factory] = lambda: session_factory_override
+    # Reads see the rows of the test transaction, there is no replica
+    app.dependency_overrides[get_db_read_session] = get_db_session_override
+    app.dependency_overrides[get_db_read_session_factory] = lambda: session_factory_override
@@ -0,0 +1,32 @@
+import pytest
+
+from app.core.config import settings
+from app.core.log_sampling import captures_body, head_sampled, tail_sampled
+
+
+def test_head_sampled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "LOG_SAMPLE_RATE", 0.5)
+    monkeypatch.setattr(settings, "LOG_SAMPLE_RATES", {"/api/health": 0, "/api/todo": 1})
+    assert not head_sampled("/api/health", "id")
+    assert head_sampled("/api/todo", "id")
+
+    # The same correlation id always gets the same decision, about half of them are sampled
+    ids = [f"{i:032x}" for i in range(1000)]
+    decisions = [head_sampled("/api/user", id_) for id_ in ids]
+    assert decisions == [head_sampled("/api/user", id_) for id_ in ids]
+    assert 400 < sum(decisions) < 600
+
+
+def test_tail_sampled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "LOG_ALWAYS_STATUS", 500)
+    monkeypatch.setattr(settings, "LOG_SLOW_REQUEST_SECONDS", 1)
+    assert tail_sampled(503, 0.1) == "status"
+    assert tail_sampled(200, 2) == "slow"
+    assert tail_sampled(404, 0.1) is None
+
+
+def test_captures_body(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert captures_body("/api/todo")
+    monkeypatch.setattr(settings, "LOG_BODY_ROUTES", ["/api/user"])
+    assert not captures_body("/api/todo")
+    assert captures_body("/api/user")
@@ -0,0 +1,52 @@
+import asyncio
+import io
+import json
+from typing import Any
+
+from app.core.log_shipping import StreamSink, StructLogQueue
+
+
+class RecordingSink:
+    def __init__(self) -> None:
+        self.batches: list[list[dict[str, Any]]] = []
+
+    def write(self, entries: list[dict[str, Any]]) -> None:
+        self.batches.append(entries)
+
+
+async def test_ship_in_batches() -> None:
+    sink = RecordingSink()
+    queue = StructLogQueue(sink, maxsize=100, batch_size=2, flush_interval=60)
+    queue.start()
+    for i in range(5):
+        queue.log_struct({"i": i})
+    # Full batches are shipped without waiting for the flush interval
+    await asyncio.sleep(0.1)
+    assert [len(batch) for batch in sink.batches] == [2, 2, 1]
+    await queue.stop()
+    assert queue.stats() == {"queued": 0, "shipped": 5, "dropped": 0, "failed": 0}
+
+
+async def test_drop_when_full() -> None:
+    newest = StructLogQueue(RecordingSink(), maxsize=2, batch_size=10, flush_interval=60)
+    oldest = StructLogQueue(
+        RecordingSink(), maxsize=2, batch_size=10, flush_interval=60, drop="oldest"
+    )
+    for i in range(3):
+        newest.log_struct({"i": i})
+        oldest.log_struct({"i": i})
+    assert list(newest.entries) == [{"i": 0}, {"i": 1}]
+    assert list(oldest.entries) == [{"i": 1}, {"i": 2}]
+    assert newest.dropped == oldest.dropped == 1
+
+
+async def test_stream_sink() -> None:
+    stream = io.StringIO()
+    queue = StructLogQueue(StreamSink(stream), maxsize=10, batch_size=10, flush_interval=60)
+    queue.log_struct({"event": "a"})
+    queue.log_struct({"event": "b"})
+    await queue.flush()
+    assert [json.loads(line) for line in stream.getvalue().splitlines()] == [
+        {"event": "a"},
+        {"event": "b"},
+    ]
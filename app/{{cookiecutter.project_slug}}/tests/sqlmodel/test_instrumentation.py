@@ -0,0 +1,23 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.core.request_context import QueryStats, current_query_stats
+from app.sqlmodel.db import DatabaseAsyncSessionManager
+
+
+async def test_failed_statement_not_timed(session_manager: DatabaseAsyncSessionManager) -> None:
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+    try:
+        async with session_manager._engine.connect() as connection:
+            with pytest.raises(DBAPIError):
+                await connection.execute(text("SELECT * FROM missing_table"))
+            await connection.rollback()
+            assert await connection.scalar(text("SELECT 1")) == 1
+            # Nothing is left on the pooled connection by the failed statement
+            assert "query_start" not in connection.info
+    finally:
+        current_query_stats.reset(token)
+    assert stats.count == 1
+    assert stats.slowest_statement == "SELECT 1"
@@ -0,0 +1,49 @@
+import os
+from collections import Counter
+
+import httpx
+import pytest
+
+# Budget of statements per request through `client`, e.g. `@query_budget(2)`
+query_budget = pytest.mark.query_budget
+
+
+class QueryCounter:
+    def __init__(self, budget: int | None = None, allow_repeats: bool = False):
+        """
+        Count the statements run while a request goes through the test client.
+        A request fails its test when it runs more than `budget` statements, or the same
+        statement twice with different parameters, the signature of an N+1 query.
+        **Parameters**
+        * `budget`: Maximum number of statements per request, unlimited when None
+        * `allow_repeats`: Accept repeated statements, e.g. for bulk savepoints
+        """
+        self.budget = budget
+        self.allow_repeats = allow_repeats
+        # Statements of the request in flight, None between requests
+        self.statements: list[str] | None = None
+        self.requests: list[tuple[str, list[str]]] = []
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if self.statements is not None:
+            self.statements.append(statement)
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self.statements = []
+
+    async def on_response(self, response: httpx.Response) -> None:
+        statements, self.statements = self.statements or [], None
+        name = f"{response.request.method} {response.request.url.path}"
+        self.requests.append((name, statements))
+        # `QUERY_BUDGET_REPORT=1 pytest -s` prints the count of every request, to set budgets
+        if os.environ.get("QUERY_BUDGET_REPORT"):
+            print(f"\nQUERY_BUDGET {name} {len(statements)}")
+
+        if self.budget is not None and len(statements) > self.budget:
+            pytest.fail(
+                f"{name} ran {len(statements)} statements, over its budget of {self.budget}:\n"
+                + "\n".join(statements)
+            )
+        repeated = [statement for statement, count in Counter(statements).items() if count > 1]
+        if repeated and not self.allow_repeats:
+            pytest.fail(f"{name} repeated statements, N+1 query?\n" + "\n".join(repeated))